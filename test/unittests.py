@@ -1,5 +1,8 @@
 import unittest
+from os.path import join, isdir
+from tempfile import TemporaryDirectory
 import numpy as np
+from scipy.linalg import eigvals_banded     # type: ignore
 
 from x1fd3.base import Parameters, \
                        PWCurve, \
@@ -7,7 +10,11 @@ from x1fd3.base import Parameters, \
                        Levels, \
                        ExpData, \
                        MatrixElements, \
-                       Fit
+                       LineList, \
+                       Grid, \
+                       PartitionFunction, \
+                       Fit, \
+                       FitScan
 
 
 class TestBase(unittest.TestCase):
@@ -154,6 +161,68 @@ class TestBase(unittest.TestCase):
             )
 
 
+    def test_03_an_pec_der(
+        self
+    ) -> None:
+
+        # file & damping function
+        params_files = [
+            ('fitted_emo.txt', None),
+            ('te_td/init_emo_td.txt', None),
+            ('te_td/init_emo_te.txt', None),
+            ('mlr_delr/init_mlr.txt', 'ds'),
+            ('mlr_delr/init_mlr.txt', 'tt'),
+            ('mlr_delr/init_delr.txt', 'tt'),
+            ('mlr_delr/init_delr.txt', 'ds')
+        ]
+
+        r_grid = np.linspace(0.8, 4.5, 20)
+
+        for fname, dampf in params_files:
+            params = Parameters()
+            params.read_pec_params(f'input/{fname}')
+            params['beta'] = np.array([1.8, 0.1, 0.3, 0.2, 0.2])
+            if dampf is not None:
+                params['dampf'] = dampf
+                params['cnval'] = np.array(params['cnval'], dtype=float)
+            pec = AnPec(params)
+
+            _, der = pec.calc_der(r_grid, with_cn=True)
+            labels = pec.der_labels(with_cn=True)
+
+            self.assertEqual(
+                der.shape[1],
+                len(labels)
+            )
+
+            # de, re, beta_n, te/td, cnval_n by central differences
+            for col, label in enumerate(labels):
+                key, _, idx = label.partition('_')
+                if key == 'cnval':
+                    idx = str(list(params['cnpow']).index(int(idx)))
+
+                u_shifted = []
+                for sign in (1, -1):
+                    tmp = Parameters()
+                    tmp.update(params)
+                    if idx:
+                        tmp[key] = np.array(params[key], dtype=float)
+                        step = 1e-6 * max(abs(tmp[key][int(idx)]), 1.)
+                        tmp[key][int(idx)] += sign * step
+                    else:
+                        step = 1e-6 * max(abs(params[key]), 1.)
+                        tmp[key] = params[key] + sign * step
+                    u_shifted.append(AnPec(tmp).calc(r_grid))
+
+                np.testing.assert_allclose(
+                    der[:, col],
+                    (u_shifted[0] - u_shifted[1]) / 2 / step,
+                    rtol=1e-5,
+                    atol=1e-5 * np.abs(der[:, col]).max(),
+                    err_msg=f'{fname} {dampf} {label}'
+                )
+
+
     def test_04_expdata(
         self
     ) -> None:
@@ -196,6 +265,233 @@ class TestBase(unittest.TestCase):
             delta=1e-5
         )
 
+        self.assertIs(
+            levels.grid,
+            Grid.get(params, params['step'])
+        )
+
+        # uniform spacing up to the point nearest to rmax
+        grid_odd = Grid.get(params, 7e-4)
+
+        self.assertAlmostEqual(
+            np.ptp(np.diff(grid_odd.r)),
+            0.,
+            delta=1e-12
+        )
+
+        self.assertLessEqual(
+            abs(grid_odd.r[-1] - params['rmax']),
+            7e-4 / 2
+        )
+
+        levels_grid = Levels(params, pec, ExpData(), grid=levels.grid)
+
+        self.assertEqual(
+            levels_grid.energy,
+            levels.energy
+        )
+
+        params['step'] = 4e-4
+        params['richardson'] = 3
+
+        levels_rich = Levels(params, pec, ExpData())
+
+        self.assertAlmostEqual(
+            levels_rich.energy[0][0],
+            levels.energy[0][0],
+            delta=1e-5
+        )
+
+        self.assertLess(
+            levels_rich.energy_err[1][0],
+            1e-5
+        )
+
+        params['richardson'] = 0
+
+        for engine, step in (('fd5', 5e-4), ('fd7', 2e-3)):
+            params['engine'] = engine
+            params['step'] = step
+
+            levels_band = Levels(params, pec, ExpData())
+
+            self.assertAlmostEqual(
+                levels_band.energy[0][0],
+                levels.energy[0][0],
+                delta=1e-5
+            )
+
+            # levels refined from fd3 eigenvalues as by full banded solution
+            grid = levels_band.grid
+            kin_diag, off_bands = grid.kinetic(engine)
+            a_band = np.vstack([pec.spline(grid.r) / grid.scale + kin_diag + 2 * grid.r_inv2, off_bands])
+            emax = pec.spline(np.array([params['rmax']]))[0] / grid.scale
+            seeded = Levels._solve_seeded(a_band, 'v', (0., emax), 0)
+
+            self.assertIsNotNone(seeded)
+
+            np.testing.assert_allclose(
+                seeded[0],
+                eigvals_banded(a_band, lower=True, select='v', select_range=(0., emax)),
+                rtol=1e-10
+            )
+
+        params['engine'] = 'fd3'
+        params['step'] = 1e-4
+
+        params['jmax'] = 10
+        params['centrifugal'] = 'hutson'
+        params['janchor'] = [10]
+
+        levels_cd = Levels(params, pec, ExpData())
+
+        self.assertAlmostEqual(
+            levels_cd.energy[1][0],
+            levels.energy[1][0],
+            delta=1e-5
+        )
+
+        self.assertLess(
+            levels_cd.energy_err[10][0],
+            1e-3
+        )
+
+        # high J: levels of divergent series are dropped, bound levels at jmax as exact
+        params['jmax'] = 40
+        params['janchor'] = []
+
+        levels_cd = Levels(params, pec, ExpData())
+
+        params['centrifugal'] = 'exact'
+
+        levels_ex = Levels(params, pec, ExpData(), eigvals_only=True, jmin=40)
+
+        self.assertEqual(
+            set(levels_cd.energy[40]),
+            set(levels_ex.energy[40])
+        )
+
+        for j, en_jv in levels_cd.energy.items():
+            for v, en_v in en_jv.items():
+                self.assertFalse(np.isnan(levels_cd.energy_err[j][v]))
+                if j > 0:
+                    self.assertGreaterEqual(en_v, levels_cd.energy[j - 1][v])
+
+        params['jmax'] = 1
+        params['centrifugal'] = 'exact'
+
+        params['vmin'] = 1
+        params['vmax'] = 2
+        params['jmaxv'] = [1, 1, 0]
+        params['emax'] = 8000.
+
+        levels_sel = Levels(params, pec, ExpData())
+
+        self.assertEqual(
+            {j: list(en_jv.keys()) for j, en_jv in levels_sel.energy.items()},
+            {0: [1, 2], 1: [1]}
+        )
+
+        self.assertAlmostEqual(
+            levels_sel.energy[1][1],
+            levels.energy[1][1],
+            delta=1e-5
+        )
+
+        params['emax'] = 5000.
+
+        levels_sel = Levels(params, pec, ExpData())
+
+        self.assertEqual(
+            {j: list(en_jv.keys()) for j, en_jv in levels_sel.energy.items()},
+            {0: [1], 1: [1]}
+        )
+
+        # v range & energy window from input file
+        with TemporaryDirectory() as tmpdir:
+            fname = join(tmpdir, 'params_sel.txt')
+            with open(fname, 'w', encoding='utf-8') as inp:
+                inp.write(
+                    '[ENERGY]\nmass1 1.007825\nmass2 34.968852\nrmin 0.7\nrmax 5.0\n' +
+                    'jmax 1\nvmin 1\nvmax 3\nemax 20000\n'
+                )
+            params_sel = Parameters()
+            params_sel.read_vr_calc_params(fname, 'ENERGY')
+
+        levels_sel = Levels(params_sel, pec, ExpData())
+
+        self.assertEqual(
+            {j: list(en_jv.keys()) for j, en_jv in levels_sel.energy.items()},
+            {0: [1, 2, 3], 1: [1, 2, 3]}
+        )
+
+        # vmin only: index window from vmin up to emax
+        del params_sel['vmax']
+
+        levels_sel = Levels(params_sel, pec, ExpData())
+
+        self.assertEqual(
+            min(levels_sel.energy[1].keys()),
+            1
+        )
+
+        self.assertGreater(
+            len(levels_sel.energy[1]),
+            3
+        )
+
+        self.assertAlmostEqual(
+            levels_sel.energy[1][1],
+            levels.energy[1][1],
+            delta=1e-5
+        )
+
+        params.update({'vmin': 0, 'vmax': -1, 'jmaxv': [], 'emax': 0.})
+
+        params['jmax'] = -1
+
+        levels_auto = Levels(params, pec, ExpData(), [0], eigvals_only=True)
+
+        params['jmax'] = max(levels_auto.energy.keys()) + 1
+
+        levels_jmax = Levels(params, pec, ExpData(), [0], eigvals_only=True)
+
+        self.assertEqual(
+            levels_jmax.energy,
+            levels_auto.energy | {params['jmax']: {}}
+        )
+
+        params['jmax'] = 1
+
+        levels_full = Levels(params, pec, ExpData(), [0, 1])
+
+        params['trim'] = 1e-8
+
+        levels_trim = Levels(params, pec, ExpData(), [0, 1])
+
+        self.assertLess(
+            levels_trim.grid.n,
+            levels.grid.n // 2
+        )
+
+        self.assertAlmostEqual(
+            levels_trim.energy[1][1],
+            levels_full.energy[1][1],
+            delta=1e-5
+        )
+
+        params['trim'] = 0.
+
+        params['nproc'] = 2
+        params['pool'] = 'thread'
+
+        levels_pool = Levels(params, pec, ExpData())
+
+        self.assertEqual(
+            levels_pool.energy,
+            levels.energy
+        )
+
         expdata = ExpData('input/exp_levels.txt')
 
         params.read_pec_params('input/fitted_emo.txt')
@@ -214,6 +510,155 @@ class TestBase(unittest.TestCase):
             delta=1e-5
         )
 
+        levels_en = Levels(params, PWCurve(), expdata, energies_only=True)
+
+        self.assertAlmostEqual(
+            levels_en.energy[3][9],
+            levels.energy[3][9],
+            delta=1e-7
+        )
+
+        self.assertEqual(
+            levels_en.rot_const[3],
+            {}
+        )
+
+        np.testing.assert_allclose(
+            levels_en.wavef(3, 9),
+            levels.wavef(3, 9),
+            atol=1e-8
+        )
+
+        # WFs are not kept by default
+        self.assertEqual(
+            levels_en.wavef_grid,
+            {}
+        )
+
+        # WFs of exp levels are kept on request, missing WFs are recalculated on demand
+        levels_wf = Levels(params, PWCurve(), expdata, energies_only=True, exp_wf=True)
+
+        self.assertEqual(
+            set(levels_wf.wavef_grid[3]),
+            set(expdata.energy[3])
+        )
+
+        self.assertAlmostEqual(
+            levels_wf.energy[3][9],
+            levels_en.energy[3][9],
+            delta=1e-7
+        )
+
+        wf_kept = levels_wf.wavef(3, 9)
+        del levels_wf.wavef_grid[3][9]
+
+        np.testing.assert_allclose(
+            levels_wf.wavef(3, 9),
+            wf_kept,
+            atol=1e-8
+        )
+
+        re_0 = params['re']
+        params['re'] = 1.001 * re_0
+
+        levels_cold = Levels(params, PWCurve(), expdata, energies_only=True)
+        levels_warm = Levels(params, PWCurve(), expdata, energies_only=True, warm=levels_en)
+
+        for j, en_jv in levels_cold.energy.items():
+            for v, en_v in en_jv.items():
+                self.assertAlmostEqual(
+                    levels_warm.energy[j][v],
+                    en_v,
+                    delta=1e-5
+                )
+
+        # small change of PEC: RQI refines all levels, no fallback
+        diag_0, r_inv2, off_bands = levels_cold._band
+        for j, en_jv in expdata.energy.items():
+            a_band = np.vstack([diag_0 + j * (j + 1) * r_inv2, off_bands])
+            vrange = (min(en_jv), max(en_jv))
+            eig_prev = Levels._warm_eigvals(levels_en, j, 'i', vrange)
+            self.assertIsNotNone(Levels._rayleigh_iteration(a_band, eig_prev, vrange[0]))
+            # eigenvalues shifted by one level: rejected by node count
+            self.assertIsNone(Levels._rayleigh_iteration(a_band, eig_prev[1:], vrange[0]))
+
+        params['re'] = re_0
+        de_0 = params['de']
+        params['de'] = 0.5 * de_0
+
+        # large change of PEC: RQI is rejected, levels by fallback
+        levels_cold = Levels(params, PWCurve(), expdata, energies_only=True)
+        levels_warm = Levels(params, PWCurve(), expdata, energies_only=True, warm=levels_en)
+
+        diag_0, r_inv2, off_bands = levels_cold._band
+        for j, en_jv in expdata.energy.items():
+            a_band = np.vstack([diag_0 + j * (j + 1) * r_inv2, off_bands])
+            vrange = (min(en_jv), max(en_jv))
+            eig_prev = Levels._warm_eigvals(levels_en, j, 'i', vrange)
+            self.assertIsNone(Levels._rayleigh_iteration(a_band, eig_prev, vrange[0]))
+
+        self.assertEqual(
+            levels_warm.energy,
+            levels_cold.energy
+        )
+
+        params['de'] = de_0
+
+        params['engine'] = 'dvr'
+        params['ndvr'] = 200
+        params['step'] = 1e-3
+
+        levels_dvr = Levels(params, PWCurve(), expdata)
+
+        self.assertAlmostEqual(
+            levels_dvr.energy[0][0],
+            levels.energy[0][0],
+            delta=1e-5
+        )
+
+        # WFs on DVR points
+        np.testing.assert_array_equal(
+            levels_dvr.r_grid,
+            levels_dvr.grid.dvr(params['ndvr'])[0]
+        )
+
+        self.assertEqual(
+            levels_dvr.wavef(0, 0).size,
+            params['ndvr']
+        )
+
+        # Bv by quadrature over DVR points
+        self.assertAlmostEqual(
+            levels_dvr.rot_const[0][0],
+            levels.rot_const[0][0],
+            delta=1e-6
+        )
+
+        self.assertAlmostEqual(
+            np.linalg.norm(levels_dvr.wavef(0, 0)),
+            1.,
+            delta=1e-10
+        )
+
+        # interpolated WF on the grid with step is normalised & close to fd3 WF
+        wf_interp = levels_dvr.grid.dvr_interp(params['ndvr'], levels_dvr.wavef(0, 0)[:, np.newaxis])[:, 0]
+
+        self.assertAlmostEqual(
+            np.linalg.norm(wf_interp),
+            1.,
+            delta=1e-10
+        )
+
+        params['engine'] = 'fd3'
+        levels_fd = Levels(params, PWCurve(), expdata)
+
+        self.assertLess(
+            np.abs(wf_interp - levels_fd.wavef(0, 0)).max(),
+            1e-5
+        )
+
+        params['step'] = 1e-4
+
 
     def test_06_matrix_elements(
         self
@@ -242,6 +687,131 @@ class TestBase(unittest.TestCase):
             delta=1e-6
         )
 
+        self.assertEqual(
+            list(melems.matrix_elements[1].keys()),
+            [0]
+        )
+
+        # requested band excluded by energy window or vmin
+        params['emax'] = 3000.
+
+        with self.assertRaises(RuntimeError):
+            MatrixElements(params, Levels(params, pec, ExpData(), [params['v1'], params['v2']]), dm)
+
+        params['emax'] = 0.
+        params['vmin'] = 1
+
+        with self.assertRaises(RuntimeError):
+            Levels(params, pec, ExpData(), [params['v1'], params['v2']])
+
+        params['vmin'] = 0
+
+        with TemporaryDirectory() as tmpdir:
+            fname = join(tmpdir, 'params_band.txt')
+            with open(fname, 'w', encoding='utf-8') as inp:
+                inp.write(
+                    '[SPECTRUM]\nmass1 1.007825\nmass2 34.968852\nrmin 0.7\nrmax 5.0\n' +
+                    'jmax 1\nv1 0\nv2 1\nvmin 1\n'
+                )
+            with self.assertRaises(RuntimeError):
+                Parameters().read_vr_calc_params(fname, 'SPECTRUM')
+
+        params['branches'] = 'all'
+
+        melems_all = MatrixElements(params, levels, dm)
+
+        self.assertEqual(
+            list(melems_all.matrix_elements[1].keys()),
+            [0, 1]
+        )
+
+        self.assertAlmostEqual(
+            melems_all.matrix_elements[0][1],
+            melems.matrix_elements[0][1],
+            delta=1e-10
+        )
+
+        # J pair by J pair without cached windows & stacked WFs: same line list
+        melems_pairs = MatrixElements(params, levels, dm)
+        melems_pairs.MEM_WINDOWS = 0
+
+        np.testing.assert_allclose(
+            melems_pairs.lines['me'],
+            melems_all.lines['me'],
+            rtol=0,
+            atol=1e-12
+        )
+
+        self.assertEqual(
+            melems_pairs._windows,
+            {}
+        )
+
+        levels_v = Levels(params, pec, ExpData(), [params['v1'], params['v2']])
+
+        self.assertEqual(
+            list(levels_v.energy[0].keys()),
+            [params['v1'], params['v2']]
+        )
+
+        melems_v = MatrixElements(params, levels_v, dm)
+
+        self.assertAlmostEqual(
+            melems_v.matrix_elements[0][1],
+            melems.matrix_elements[0][1],
+            delta=1e-10
+        )
+
+        for wfstore, delta in (('float32', 1e-7), ('support', 1e-9), ('mmap', 1e-15)):
+            params['wfstore'] = wfstore
+            with Levels(params, pec, ExpData(), [params['v1'], params['v2']]) as levels_st:
+
+                self.assertLess(
+                    np.abs(levels_st.wavef(1, 1) - levels_v.wavef(1, 1)).max(),
+                    delta
+                )
+
+                melems_st = MatrixElements(params, levels_st, dm)
+
+                self.assertAlmostEqual(
+                    melems_st.matrix_elements[0][1],
+                    melems_v.matrix_elements[0][1],
+                    delta=delta
+                )
+
+                # no dense float64 copies of stored WFs are kept
+                self.assertFalse(
+                    any(isinstance(val, np.ndarray) and val.ndim > 2 for val in vars(melems_st).values())
+                )
+
+                wfdir = levels_st._wfdir.name if levels_st._wfdir is not None else None
+
+            if wfdir is not None:
+                self.assertFalse(
+                    isdir(wfdir)
+                )
+
+        params['wfstore'] = 'full'
+
+        del params['v1'], params['v2']
+        params['vmax'] = 2
+        params['branches'] = 'PR'
+
+        melems_mb = MatrixElements(params, levels, dm)
+
+        self.assertEqual(
+            melems_mb.bands,
+            [(0, 1), (0, 2), (1, 2)]
+        )
+
+        line = melems_mb.lines[(melems_mb.lines['v2'] == 1) & (melems_mb.lines['j2'] == 0)][0]
+
+        self.assertAlmostEqual(
+            line['me'],
+            melems.matrix_elements[0][1],
+            delta=1e-10
+        )
+
 
     def test_07_fit(
         self
@@ -253,7 +823,67 @@ class TestBase(unittest.TestCase):
         pec = PWCurve('input/pw_pec.txt')
         expdata = ExpData('input/exp_levels.txt')
 
+        params_pa = Parameters()
+        params_pa.read_pec_params('input/init_emo.txt', approx=True)
+        # variable projection on request in PecApprox input only
+        with TemporaryDirectory() as tmpdir:
+            fname = join(tmpdir, 'init_emo.txt')
+            with open('input/init_emo.txt', encoding='utf-8') as init, open(fname, 'w', encoding='utf-8') as inp:
+                inp.write(init.read() + '\nvarpro yes\n')
+            params_vp = Parameters()
+            params_vp.read_pec_params(fname, approx=True)
+            with self.assertRaises(RuntimeError):
+                Parameters().read_pec_params(fname)
+
+        self.assertFalse(Fit(params_pa, pec, ExpData()).varpro)
+
+        fit_vp = Fit(params_vp, pec, ExpData())
+        self.assertTrue(fit_vp.varpro)
+        fit_vp.fit()
+        Fit(params_pa, pec, ExpData()).fit()
+
+        self.assertAlmostEqual(
+            params_vp['de'],
+            params_pa['de'],
+            delta=1e-3
+        )
+
+        self.assertAlmostEqual(
+            params_vp['re'],
+            params_pa['re'],
+            delta=1e-8
+        )
+
         fit = Fit(params, pec, expdata)
+
+        guess = [params['de'], params['re'], *params['beta']]
+        jac_an = fit._jac(guess)
+        jac_fd = fit._jac_fd(guess)
+
+        np.testing.assert_allclose(
+            jac_fd,
+            jac_an,
+            atol=0.02 * np.abs(jac_an).max()
+        )
+
+        params['nproc'] = 2
+        params['pool'] = 'thread'
+
+        np.testing.assert_array_equal(
+            fit._jac_fd(guess),
+            jac_fd
+        )
+
+        # process pool: warm start from eigenvalues sent to workers
+        params['pool'] = 'process'
+
+        np.testing.assert_array_equal(
+            fit._jac_fd(guess),
+            jac_fd
+        )
+
+        params['nproc'] = 1
+
         fit.fit()
 
         self.assertAlmostEqual(
@@ -262,5 +892,210 @@ class TestBase(unittest.TestCase):
             delta=0.01
         )
 
+        # trimmed grid follows far moves of parameters
+        params_trim = Parameters()
+        params_trim.read_vr_calc_params('input/params_fit.txt', 'FIT')
+        params_trim.read_pec_params('input/fitted_emo.txt')
+        params_trim['trim'] = 1e-8
+
+        fit_trim = Fit(params_trim, pec, expdata)
+        grid_0 = fit_trim.grid
+        guess_trim = [params_trim['de'], params_trim['re'], *params_trim['beta']]
+
+        fit_trim._res(guess_trim)
+
+        self.assertIs(
+            fit_trim.grid,
+            grid_0
+        )
+
+        guess_trim[1] += 0.05
+        fit_trim._res(guess_trim)
+
+        self.assertIsNot(
+            fit_trim.grid,
+            grid_0
+        )
+
+        params_stages = Parameters()
+        params_stages.read_vr_calc_params('input/params_fit.txt', 'FIT')
+        params_stages.read_pec_params('input/fitted_emo.txt')
+        params_stages['stepfit'] = [1e-3]
+
+        fit_stages = Fit(params_stages, pec, expdata)
+        fit_stages.fit()
+
+        self.assertAlmostEqual(
+            fit_stages.params['re'],
+            fit.params['re'],
+            delta=1e-5
+        )
+
+        # levels selection keywords are not accepted for FIT
+        with TemporaryDirectory() as tmpdir:
+            fname = join(tmpdir, 'params_fit.txt')
+            with open('input/params_fit.txt', encoding='utf-8') as init, open(fname, 'w', encoding='utf-8') as inp:
+                inp.write(init.read() + '\nemax 20000\n')
+            with self.assertRaises(RuntimeError):
+                Parameters().read_vr_calc_params(fname, 'FIT')
+
+    def test_07_fit_scan(
+        self
+    ) -> None:
+
+        params = Parameters()
+        params.read_vr_calc_params('input/params_scan.txt', 'SCAN')
+        params.read_pec_params('input/init_emo.txt')
+
+        self.assertIs(
+            params['varpro'],
+            False
+        )
+
+        params['nmin'] = 3
+        params['nmax'] = 4
+        params['nstart'] = 2
+        params['nproc'] = 2
+        params['pool'] = 'thread'
+        pec = PWCurve('input/pw_pec.txt')
+
+        scan = FitScan(params, pec, ExpData())
+
+        self.assertEqual(
+            [(res['order'], res['start']) for res in scan.results],
+            [(3, 0), (3, 1), (4, 0), (4, 1)]
+        )
+
+        params_4 = Parameters()
+        params_4.read_pec_params('input/init_emo.txt')
+        params_4['beta'] = params_4['beta'][:5]
+        fit_4 = Fit(params_4, pec, ExpData())
+        fit_4.fit()
+
+        self.assertAlmostEqual(
+            scan.results[2]['rms'],
+            float(np.sqrt(np.mean(fit_4.residual()**2))),
+            delta=1e-12
+        )
+
+        self.assertAlmostEqual(
+            scan.results[2]['params']['re'],
+            params_4['re'],
+            delta=1e-10
+        )
+
+        self.assertLessEqual(
+            scan.best[4]['rms'],
+            scan.best[3]['rms']
+        )
+
+        # starts converged to the same minimum: lower start wins on last-bit RMS differences
+        self.assertEqual(
+            {order: res['start'] for order, res in scan.best.items()},
+            {3: 0, 4: 0}
+        )
+
+        params['pool'] = 'process'
+
+        scan_proc = FitScan(params, pec, ExpData())
+
+        self.assertEqual(
+            [res['rms'] for res in scan_proc.results],
+            [res['rms'] for res in scan.results]
+        )
+
+        # levels keywords are not accepted for SCAN
+        with TemporaryDirectory() as tmpdir:
+            fname = join(tmpdir, 'params_scan.txt')
+            with open(fname, 'w', encoding='utf-8') as inp:
+                inp.write('[SCAN]\nnmin 2\nnmax 3\nengine fd5\n')
+            with self.assertRaises(RuntimeError):
+                Parameters().read_vr_calc_params(fname, 'SCAN')
+
+    def test_08_line_list(
+        self
+    ) -> None:
+
+        params = Parameters()
+        params.read_vr_calc_params('input/params_spectrum.txt', 'SPECTRUM')
+        params['jmax'] = 3
+
+        pec = PWCurve('input/pw_pec.txt')
+        dm = PWCurve('input/pw_dm.txt')
+
+        levels = Levels(params, pec, ExpData(), [params['v1'], params['v2']])
+
+        melems = MatrixElements(params, levels, dm)
+
+        params['lformat'] = 'csv'
+        params['lsort'] = 'freq'
+        params['temp'] = np.array([298., 1000.])
+
+        # short grid for Q(T)
+        params_pf = Parameters()
+        params_pf.update(params)
+        params_pf['rmax'] = 2.5
+        pfunc = PartitionFunction(params_pf, pec)
+
+        qfunc = pfunc.calc(params['temp'])
+
+        self.assertAlmostEqual(
+            qfunc[0],
+            pfunc.calc(np.array([298.]))[0],
+            delta=1e-12
+        )
+
+        self.assertTrue(
+            qfunc[1] > qfunc[0] > 1
+        )
+
+        # zero of energy from corrected energies as for levels of line list
+        self.assertAlmostEqual(
+            pfunc.en0,
+            Levels(params_pf, pec, ExpData(), [0]).energy[0][0],
+            delta=1e-5
+        )
+
+        # line list is streamed, no lines in memory
+        with TemporaryDirectory() as tmpdir:
+            fname = join(tmpdir, 'lines.csv')
+            nline = LineList(params, pfunc).write(melems.line_chunks(), fname)
+            data = np.genfromtxt(fname, delimiter=',', skip_header=1, usecols=(5, 10, 11, 12, 3))
+
+        self.assertNotIn(
+            'lines',
+            vars(melems)
+        )
+
+        self.assertEqual(
+            nline,
+            len(melems.lines)
+        )
+
+        self.assertTrue(
+            np.all(np.diff(data[:, 0]) >= 0)
+        )
+
+        # population ratio for ground level: v'' = 0, J'' = 0
+        ground = data[data[:, 4] == 0][0]
+
+        self.assertAlmostEqual(
+            ground[2] / ground[3],
+            qfunc[1] / qfunc[0],
+            delta=1e-4 * qfunc[1] / qfunc[0]
+        )
+
+        rows = LineList(params, pfunc).calc(melems.lines)
+        params['amin'] = np.median(rows['a'])
+
+        with TemporaryDirectory() as tmpdir:
+            nline_cut = LineList(params, pfunc).write(melems.line_chunks(), join(tmpdir, 'lines.csv'))
+
+        self.assertEqual(
+            nline_cut,
+            np.count_nonzero(rows['a'] >= params['amin'])
+        )
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
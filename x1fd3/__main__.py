@@ -8,7 +8,8 @@ from x1fd3.cli import DriverPecApprox, \
                       DriverLevelsAn, \
                       DriverSpectrumPW, \
                       DriverSpectrumAn, \
-                      DriverFitExp
+                      DriverFitExp, \
+                      DriverPecScan
 from x1fd3.gui import MainWindow
 
 parser = ArgumentParser()
@@ -16,7 +17,7 @@ parser = ArgumentParser()
 parser.add_argument(
     'mode',
     help = 'run mode',
-    choices = ['GUI', 'PecApprox', 'LevelsPW', 'LevelsAn', 'SpectrumPW', 'SpectrumAn', 'FitExp']
+    choices = ['GUI', 'PecApprox', 'LevelsPW', 'LevelsAn', 'SpectrumPW', 'SpectrumAn', 'FitExp', 'PecScan']
 )
 
 parser.add_argument(
@@ -48,6 +49,8 @@ else:
                 DriverSpectrumAn(args.input_files, out).run()
             case 'FitExp':
                 DriverFitExp(args.input_files, out).run()
+            case 'PecScan':
+                DriverPecScan(args.input_files, out).run()
         print('Success!')
     except BaseException: # pylint: disable = W0718
         err = traceback.format_exc() # pylint: disable=C0103
@@ -1,19 +1,27 @@
+from .grid import Grid
 from .levels import Levels
 from .matrix_elements import MatrixElements
+from .line_list import LineList
+from .partition_function import PartitionFunction
 from .parameters import Parameters
 from .p_w_curve import PWCurve
 from .logger import Logger
 from .exp_data import ExpData
 from .an_pec import AnPec
 from .fit import Fit
+from .fit_scan import FitScan
 
 __all__ = (
+    'Grid',
     'Levels',
     'MatrixElements',
+    'LineList',
+    'PartitionFunction',
     'Parameters',
     'PWCurve',
     'Logger',
     'ExpData',
     'AnPec',
-    'Fit'
+    'Fit',
+    'FitScan'
 )
@@ -49,6 +49,71 @@ class AnPec:
 
         return res
 
+    def calc_der(
+        self,
+        r_inp:Float64Array,
+        with_cn:bool=False
+    ) -> tuple[Float64Array, Float64Array]:
+        '''
+        calculate pec vals and partial derivatives for grid of Rs
+        derivatives are in columns, see der_labels for order:
+        de, re, beta_0, beta_1, ..., te or td (if given), cnval_0, cnval_1, ... (if with_cn)
+        '''
+        p = self.params
+
+        match p['ptype']:
+            case 'EMO':
+                res, der = self._emo_der(r_inp)
+            case 'MLR':
+                res, der = self._mlr_der(r_inp)
+            case 'DELR':
+                res, der = self._delr_der(r_inp)
+            case _:
+                raise RuntimeError(f"{p['ptype']} not implemented")
+
+        if p['te'] is not None and p['td'] is not None:
+            raise RuntimeError('Both Te and Td given')
+
+        nbase = 2 + len(p['beta'])
+        cols = [der[:, :nbase]]
+
+        if p['te'] is not None:
+            res += p['te']
+            cols.append(np.ones((len(r_inp), 1)))
+
+        if p['td'] is not None:
+            res += (p['td'] - p['de'])
+            cols[0][:, 0] -= 1
+            cols.append(np.ones((len(r_inp), 1)))
+
+        if with_cn and p['ptype'] in ('MLR', 'DELR'):
+            cols.append(der[:, nbase:])
+
+        return res, np.hstack(cols)
+
+    def der_labels(
+        self,
+        with_cn:bool=False
+    ) -> list[str]:
+        '''
+        names of parameters for columns of calc_der output
+        '''
+        p = self.params
+
+        labels = ['de', 're']
+        labels.extend(f'beta_{n}' for n in range(len(p['beta'])))
+
+        if p['te'] is not None:
+            labels.append('te')
+
+        if p['td'] is not None:
+            labels.append('td')
+
+        if with_cn and p['ptype'] in ('MLR', 'DELR'):
+            labels.extend(f'cnval_{n}' for n in p['cnpow'])
+
+        return labels
+
     def _emo(
         self,
         r_inp:Float64Array,
@@ -66,6 +131,31 @@ class AnPec:
 
         return val
 
+    def _emo_der(
+        self,
+        r_inp:Float64Array,
+    ) -> tuple[Float64Array, Float64Array]:
+        '''
+        calculate EMO value and derivatives over de, re, beta for given r point and params
+        '''
+        p = self.params
+
+        yq = self._y(r_inp, p['q'], p['rref'])
+
+        beta_pol = self._beta(yq)
+
+        ex = np.exp(- beta_pol * (r_inp - p['re']))
+
+        val:Float64Array = p['de'] * (1 - ex)**2
+
+        der:Float64Array = np.empty((len(r_inp), 2 + len(p['beta'])))
+        der[:, 0] = (1 - ex)**2
+        der[:, 1] = - 2 * p['de'] * (1 - ex) * ex * beta_pol
+        for n in range(len(p['beta'])):
+            der[:, 2 + n] = 2 * p['de'] * (1 - ex) * ex * (r_inp - p['re']) * yq**n
+
+        return val, der
+
     def _mlr(
         self,
         r_inp:Float64Array,
@@ -92,6 +182,53 @@ class AnPec:
 
         return val
 
+    def _mlr_der(
+        self,
+        r_inp:Float64Array,
+    ) -> tuple[Float64Array, Float64Array]:
+        '''
+        calculate MLR value and derivatives over de, re, beta, cnval for given r point and params
+        '''
+        p = self.params
+
+        yq = self._y(r_inp, p['q'], p['rref'])
+        yp = self._y(r_inp, p['p'], p['rref'])
+        yp_eq = self._y(r_inp, p['p'], p['re'])
+
+        r_re = np.array([p['re']])
+        ulr_re = self._lr(r_re)[0]
+        der_ulr_re = self._lr(r_re, 1)[0]
+        ulr = self._lr(r_inp)
+
+        binf = np.log(2 * p['de'] / ulr_re)
+        beta_pol = self._beta(yq)
+        beta_pol *= (1 - yp)
+        beta_pol += binf * yp
+
+        ex = np.exp(- beta_pol * yp_eq)
+        g = ulr / ulr_re * ex
+
+        val:Float64Array = p['de'] * (1 - g)**2
+
+        # dU/dg
+        dval_g = - 2 * p['de'] * (1 - g)
+        # d(yp_eq)/dre
+        dyp_eq = - 2 * p['p'] * p['re']**(p['p'] - 1) * r_inp**p['p'] \
+                 / (r_inp**p['p'] + p['re']**p['p'])**2
+
+        nb = len(p['beta'])
+        der:Float64Array = np.empty((len(r_inp), 2 + nb + len(p['cnpow'])))
+        der[:, 0] = (1 - g)**2 + 2 * (1 - g) * g * yp * yp_eq
+        der[:, 1] = dval_g * g * (- der_ulr_re / ulr_re * (1 - yp * yp_eq) - beta_pol * dyp_eq)
+        for n in range(nb):
+            der[:, 2 + n] = - dval_g * g * yq**n * (1 - yp) * yp_eq
+        for k, n in enumerate(p['cnpow']):
+            phi = self._lr_term(r_inp, n)
+            phi_re = self._lr_term(r_re, n)[0]
+            der[:, 2 + nb + k] = dval_g * (ex * phi - g * phi_re * (1 - yp * yp_eq)) / ulr_re
+
+        return val, der
+
     def _delr(
         self,
         r_inp:Float64Array
@@ -121,30 +258,95 @@ class AnPec:
 
         return val
 
+    def _delr_der(
+        self,
+        r_inp:Float64Array
+    ) -> tuple[Float64Array, Float64Array]:
+        '''
+        calculate DELR value and derivatives over de, re, beta, cnval for given r point and params
+        '''
+        p = self.params
+
+        r_re = np.array([p['re']])
+
+        yq = self._y(r_inp, p['q'], p['rref'])
+        yq_re = self._y(r_re, p['q'], p['rref'])
+
+        beta_pol = self._beta(yq)
+        beta_pol_re = self._beta(yq_re)[0]
+        # d(beta(y(re)))/dre
+        der_beta_pol_re = self._beta(yq_re, 1)[0] * self._y(r_re, p['q'], p['rref'], 1)[0]
+
+        ulr = self._lr(r_inp)
+        ulr_re = self._lr(r_re)[0]
+
+        der_ulr_re = self._lr(r_re, 1)[0]
+        der2_ulr_re = self._lr(r_re, 2)[0]
+
+        a = p['de'] - ulr_re - der_ulr_re / beta_pol_re
+        b = p['de'] - ulr_re + a
+
+        ex = np.exp(- beta_pol * (r_inp - p['re']))
+
+        val:Float64Array = p['de'] - ulr + a * ex**2 - b * ex
+
+        # dU/d(ex)
+        dval_ex = 2 * a * ex - b
+
+        nb = len(p['beta'])
+        der:Float64Array = np.empty((len(r_inp), 2 + nb + len(p['cnpow'])))
+        der[:, 0] = (1 - ex)**2
+        da = - der_ulr_re - der2_ulr_re / beta_pol_re + der_ulr_re / beta_pol_re**2 * der_beta_pol_re
+        db = - der_ulr_re + da
+        der[:, 1] = da * ex**2 - db * ex + dval_ex * ex * beta_pol
+        for n in range(nb):
+            da = der_ulr_re / beta_pol_re**2 * yq_re[0]**n
+            der[:, 2 + n] = da * (ex**2 - ex) - dval_ex * ex * (r_inp - p['re']) * yq**n
+        for k, n in enumerate(p['cnpow']):
+            phi_re = self._lr_term(r_re, n)[0]
+            da = - phi_re - self._lr_term(r_re, n, 1)[0] / beta_pol_re
+            db = - phi_re + da
+            der[:, 2 + nb + k] = - self._lr_term(r_inp, n) + da * ex**2 - db * ex
+
+        return val, der
+
     def _y(
         self,
         r_inp:Float64Array,
         q:int,
-        rref:float
+        rref:float,
+        der_order:int=0
     ) -> Float64Array:
         '''
-        calculate y function  value for given r points and params
+        calculate y function  value (or its first derivative) for given r points and params
         '''
-        val:Float64Array = (r_inp**q - rref**q) / (r_inp**q + rref**q)
+        if der_order == 0:
+            val:Float64Array = (r_inp**q - rref**q) / (r_inp**q + rref**q)
+        elif der_order == 1:
+            val = 2 * q * r_inp**(q - 1) * rref**q / (r_inp**q + rref**q)**2
+        else:
+            raise RuntimeError(f"order {der_order} not implemented")
         return val
 
     def _beta(
         self,
-        y_vals:Float64Array
+        y_vals:Float64Array,
+        der_order:int=0
     )-> Float64Array:
         '''
-        calculate beta function value for given r point and params
+        calculate beta function value (or its first derivative over y) for given r point and params
         '''
         p = self.params
 
         val:Float64Array = np.zeros(len(y_vals))
-        for n, b in enumerate(p['beta']):
-            val += b * y_vals**n
+        if der_order == 0:
+            for n, b in enumerate(p['beta']):
+                val += b * y_vals**n
+        elif der_order == 1:
+            for n, b in enumerate(p['beta'][1:], 1):
+                val += n * b * y_vals**(n - 1)
+        else:
+            raise RuntimeError(f"order {der_order} not implemented")
 
         return val
 
@@ -167,6 +369,30 @@ class AnPec:
             for n, cn in zip(p['cnpow'], p['cnval']):
                 val -= self._dampf(r_inp, n) * n * cn * r_inp**(- n - 1)
                 val += self._dampf(r_inp, n, 1) * cn * r_inp**-n
+        elif der_order == 2:
+            for n, cn in zip(p['cnpow'], p['cnval']):
+                val += self._dampf(r_inp, n) * n * (n + 1) * cn * r_inp**(- n - 2)
+                val -= 2 * self._dampf(r_inp, n, 1) * n * cn * r_inp**(- n - 1)
+                val += self._dampf(r_inp, n, 2) * cn * r_inp**-n
+        else:
+            raise RuntimeError(f"order {der_order} not implemented")
+
+        return val
+
+    def _lr_term(
+        self,
+        r_inp:Float64Array,
+        n:int,
+        der_order:int=0
+    ) -> Float64Array:
+        '''
+        calculate long-range term for C_n = 1 (derivative of long-range value over C_n)
+        '''
+        val:Float64Array
+        if der_order == 0:
+            val = self._dampf(r_inp, n) * r_inp**-n
+        elif der_order == 1:
+            val = self._dampf(r_inp, n, 1) * r_inp**-n - self._dampf(r_inp, n) * n * r_inp**(- n - 1)
         else:
             raise RuntimeError(f"order {der_order} not implemented")
 
@@ -255,5 +481,32 @@ class AnPec:
                     return np.zeros(len(r_inp))
                 case _:
                     raise RuntimeError(f"{p['dampf']} not implemented")
+        elif der_order == 2:
+            match p['dampf']:
+                case 'tt':
+                    ex = np.exp(- btt[s] * rho * r_inp)
+                    sm = np.ones(len(r_inp))
+                    dsm = np.zeros(len(r_inp))
+                    d2sm = np.zeros(len(r_inp))
+                    for k in range(1, n + s):
+                        sm += (btt[s] * rho * r_inp)**k / factorial(k)
+                        dsm += k * btt[s] * rho *(btt[s] * rho * r_inp)**(k - 1) / factorial(k)
+                        if k > 1:
+                            d2sm += k * (k - 1) * (btt[s] * rho)**2 \
+                                    * (btt[s] * rho * r_inp)**(k - 2) / factorial(k)
+                    val = - (btt[s] * rho)**2 * ex * sm + 2 * btt[s] * rho * ex * dsm - ex * d2sm
+                    return val
+                case 'ds':
+                    ex = np.exp(- bds[s] * rho * r_inp / n
+                                - cds[s] * (rho * r_inp)**2 / n**0.5)
+                    w = bds[s] * rho / n + 2 * cds[s] * rho**2 * r_inp / n**0.5
+                    val = (n + s) * (1 - ex)**(n + s - 2) * ex \
+                           * ((n + s - 1) * ex * w**2 - (1 - ex) * w**2
+                              + 2 * cds[s] * rho**2 / n**0.5 * (1 - ex))
+                    return val
+                case 'none':
+                    return np.zeros(len(r_inp))
+                case _:
+                    raise RuntimeError(f"{p['dampf']} not implemented")
         else:
             raise RuntimeError(f"order {der_order} not implemented")
@@ -1,19 +1,35 @@
+from typing import ClassVar
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
+import numpy.typing as npt
 from scipy.optimize import least_squares      # type: ignore
 
 from .p_w_curve import PWCurve
 from .parameters import Parameters
 from .exp_data import ExpData
 from .levels import Levels
+from .grid import Grid
 from .an_pec import AnPec
 from .logger import Logger
 
+Float64Array = npt.NDArray[np.float64]
+
 class Fit:
     '''
     least square fit 
     a) pec approximation if no exp. levels provided
     b) fit pec to exp. levels otherwise
     '''
+    # relative step of forward differences, same as scipy '2-point'
+    EPS_FD:ClassVar[float] = float(np.finfo(float).eps**0.5)
+    # tolerances of least squares for coarse grid stages
+    TOL_COARSE:ClassVar[float] = 1e-6
+    # relative change of fitted parameters (absolute for |x| < 1) to trim grid again
+    TRIM_REL:ClassVar[float] = 0.01
+    # PEC types linear in de for fixed re & beta
+    VARPRO_PTYPES:ClassVar[tuple[str, ...]] = ('EMO', 'DELR')
+
     def __init__(
         self,
         params:Parameters,
@@ -21,28 +37,77 @@ class Fit:
         expdata:ExpData
     ) -> None:
         '''
-        set input data
+        set input data,
+        variable projection (de by linear least squares inside residual) is used if params['varpro']
+        for pec approximation with PEC types linear in de
         '''
         self.params = params
         self.pec = pec
         self.expdata = expdata
         self.mes = 'not fitted'
+        self.varpro:bool = (
+            params.get('varpro', False) and expdata.nlev == 0 and params['ptype'] in self.VARPRO_PTYPES
+        )
+
+        # grid shared by all levels calculations of the stage, exp levels only,
+        # trimmed (if params['trim'] > 0) for parameters _trim_guess
+        self.grid:Grid | None = None
+        self._trim_guess:Float64Array = np.array([])
+
+        # levels for last guess, shared by residual and jacobian
+        self._levels_guess:list[float] = []
+        self._levels:Levels | None = None
+
+        self._set_grid(params.get('step', 0.))
 
 
     def fit(
         self
     ) -> str:
         '''
-        perform least square fit
+        perform least square fit,
+        for exp levels coarse-to-fine: stages with coarser steps params['stepfit'] with loose tolerances,
+        each started from the previous result, final stage with params['step']
         '''
         # params -> guess
         guess = [self.params['de'], self.params['re']]
         guess.extend(self.params['beta'])
 
+        if self.varpro:
+            # least squares for re & beta only
+            res_1 = least_squares(self._res_vp, guess[1:], jac=self._jac_vp)
+            if not res_1.success:
+                raise RuntimeError(f'\nfit FAILED: {res_1.message}')
+            self.mes = f'PEC fit done: {res_1.message} (variable projection for de)'
+
+            # fit result -> params
+            tmp, _ = self._varpro(list(res_1.x))
+            self.params['de'] = tmp['de']
+            self.params['re'] = res_1.x[0]
+            self.params['beta'] = np.array(list(res_1.x[1:]))
+
+            return self.mes
+
+        stages = sorted(self.params.get('stepfit', []), reverse=True) if self.expdata.nlev > 0 else []
+
         # scipy least squares
-        res_1 = least_squares(self._res, guess)
+        jac = self._jac if self.params.get('jac', 'analytic') == 'analytic' else self._jac_fd
+        for stage, step in enumerate(stages):
+            self._set_grid(step)
+            res_1 = least_squares(
+                self._res, guess, jac=jac, ftol=self.TOL_COARSE, xtol=self.TOL_COARSE, gtol=self.TOL_COARSE
+            )
+            if not res_1.success:
+                raise RuntimeError(f'\nfit FAILED at stage {stage + 1} (step {step}): {res_1.message}')
+            guess = list(res_1.x)
+
+        if stages:
+            self._set_grid(self.params['step'])
+        res_1 = least_squares(self._res, guess, jac=jac)
         if res_1.success:
             self.mes = f'PEC fit done: {res_1.message}'
+            if stages:
+                self.mes += f' ({len(stages)} coarse grid stage(s) before final step {self.params["step"]})'
         else:
             raise RuntimeError(f'\nfit FAILED: {res_1.message}')
 
@@ -54,6 +119,40 @@ class Fit:
         return self.mes
 
 
+    def residual(
+        self
+    ) -> Float64Array:
+        '''
+        weighted residual (exp levels & pec) for current params, e.g. for RSS of fitted params
+        '''
+        res:Float64Array = np.array(self._res([self.params['de'], self.params['re'], *self.params['beta']]))
+        return res
+
+
+    def _set_grid(
+        self,
+        step:float,
+        guess:list[float] | None = None
+    ) -> None:
+        '''
+        grid with given step for levels of all following calculations, exp levels only,
+        trimmed for guess (initial params if not given),
+        cached levels are dropped: warm start requires the same grid
+        '''
+        if self.expdata.nlev == 0:
+            return
+
+        if guess is None:
+            guess = [self.params['de'], self.params['re'], *self.params['beta']]
+        tmp = self._guess_to_params(list(guess))
+        tmp['step'] = step
+
+        self.grid = Levels.get_grid(tmp, PWCurve(), self.expdata)
+        self._trim_guess = np.array(guess, dtype=float)
+        self._levels_guess = []
+        self._levels = None
+
+
     def print_state(
         self,
         label:str,
@@ -64,13 +163,58 @@ class Fit:
         '''
         if self.expdata.nlev > 0:
             out.print(f'{label} levels')
-            Levels(self.params, PWCurve(), self.expdata).print_with_expdata(out)
+            with Levels(self.params, PWCurve(), self.expdata) as levels:
+                levels.print_with_expdata(out)
         out.print(f'{label} PEC\n')
         self.pec.print_with_anpec(self.params, out)
         out.print(f'\n{label} parameters\n')
         self.params.print_pec_params(out)
 
 
+    def _guess_to_params(
+        self,
+        guess:list[float]
+    ) -> Parameters:
+        '''
+        copy of params with fitted values from guess
+        '''
+        tmp = Parameters()
+        tmp.update(self.params)
+
+        tmp['de'] = guess[0]
+        tmp['re'] = guess[1]
+        tmp['beta'] = guess[2:]
+
+        return tmp
+
+
+    def _calc_levels(
+        self,
+        guess:list[float],
+        tmp:Parameters
+    ) -> Levels:
+        '''
+        calc energies for guess, reuse if already done for the same guess,
+        WFs of exp levels are kept for analytic jacobian only,
+        trimmed grid is rebuilt if any parameter moved by more than TRIM_REL since trimming
+        '''
+        if self.params.get('trim', 0.) > 0 and self.grid is not None and np.any(
+            np.abs(np.subtract(guess, self._trim_guess)) > self.TRIM_REL * np.maximum(np.abs(self._trim_guess), 1.)
+        ):
+            # turning points may have moved far: trim grid again for guess
+            self._set_grid(self.grid.step, guess)
+
+        if self._levels is None or not np.array_equal(guess, self._levels_guess):
+            # warm start from levels of previous guess
+            self._levels = Levels(
+                tmp, PWCurve(), self.expdata, grid=self.grid, energies_only=True, warm=self._levels,
+                exp_wf=self.params.get('jac', 'analytic') == 'analytic'
+            )
+            self._levels_guess = list(guess)
+
+        return self._levels
+
+
     def _res(
         self,
         guess:list[float]
@@ -79,25 +223,189 @@ class Fit:
         residual for fit
         '''
         # fitted params
-        tmp = Parameters()
-        tmp.update(self.params)
+        tmp = self._guess_to_params(guess)
+
+        # exp levels
+        levels = self._calc_levels(guess, tmp) if self.expdata.nlev > 0 else None
 
+        return self._calc_res(tmp, self.pec, self.expdata, levels)
+
+
+    @staticmethod
+    def _res_fd(
+        params:Parameters,
+        pec:PWCurve,
+        expdata:ExpData,
+        grid:Grid | None,
+        warm:Levels | None,
+        guess:Float64Array
+    ) -> list[float]:
+        '''
+        residual for perturbed guess of finite differences,
+        levels are not cached & warm started from warm (levels of current guess),
+        levels are solved serially as worker is already in pool,
+        static to be picklable for process pool with only data it needs
+        '''
+        # fitted params
+        tmp = Parameters()
+        tmp.update(params)
         tmp['de'] = guess[0]
         tmp['re'] = guess[1]
-        tmp['beta'] = guess[2:]
+        tmp['beta'] = list(guess[2:])
+        tmp['nproc'] = 1
 
-        # residual calc
+        # exp levels
+        levels = None
+        if expdata.nlev > 0:
+            levels = Levels(tmp, PWCurve(), expdata, grid=grid, energies_only=True, warm=warm)
+
+        return Fit._calc_res(tmp, pec, expdata, levels)
+
+
+    def _varpro(
+        self,
+        guess:list[float]
+    ) -> tuple[Parameters, Float64Array]:
+        '''
+        params with optimal de for re & beta from guess & weighted residual for pec approximation,
+        U is affine in de: U = de * dU/dde + (U - de * dU/dde), so de is found
+        by weighted linear least squares
+        '''
+        tmp = self._guess_to_params([self.params['de'], *guess])
+
+        val, der = AnPec(tmp).calc_der(self.pec.rvs)
+        col = der[:, 0] / self.pec.evs
+        rhs = (self.pec.cvs - val + tmp['de'] * der[:, 0]) / self.pec.evs
+
+        tmp['de'] = float(col @ rhs / (col @ col))
+
+        return tmp, rhs - tmp['de'] * col
+
+
+    def _res_vp(
+        self,
+        guess:list[float]
+    ) -> Float64Array:
+        '''
+        residual for variable projection, guess = re & beta
+        '''
+        _, res = self._varpro(guess)
+        return res
+
+
+    def _jac_vp(
+        self,
+        guess:list[float]
+    ) -> Float64Array:
+        '''
+        Kaufman jacobian for variable projection: weighted derivatives over re & beta
+        at optimal de projected onto orthogonal complement of weighted de column
+        '''
+        tmp, _ = self._varpro(guess)
+        _, der = AnPec(tmp).calc_der(self.pec.rvs)
+
+        col = der[:, 0] / self.pec.evs
+        col /= np.linalg.norm(col)
+        jac:Float64Array = - der[:, 1:1 + len(guess)] / self.pec.evs[:, np.newaxis]
+
+        return jac - np.outer(col, col @ jac)
+
+
+    @staticmethod
+    def _calc_res(
+        tmp:Parameters,
+        pec:PWCurve,
+        expdata:ExpData,
+        levels:Levels | None
+    ) -> list[float]:
+        '''
+        residual for fitted params & levels
+        '''
         res:list[float] = []
 
         # exp levels
-        if self.expdata.nlev > 0:
-            levels = Levels(tmp, PWCurve(), self.expdata)
-            for j, en_jv in self.expdata.energy.items():
+        if levels is not None:
+            for j, en_jv in expdata.energy.items():
                 for v, en_v in en_jv.items():
                     res.append((levels.energy[j][v] - en_v) / 0.1)
 
         # pec
-        pec_an = AnPec(tmp).calc(self.pec.rvs)
-        res.extend((self.pec.cvs - pec_an) / self.pec.evs)
+        pec_an = AnPec(tmp).calc(pec.rvs)
+        res.extend((pec.cvs - pec_an) / pec.evs)
 
         return res
+
+
+    def _jac(
+        self,
+        guess:list[float]
+    ) -> Float64Array:
+        '''
+        analytic jacobian for residual
+        dE(v,J)/dp = <psi(v,J)|dU/dp|psi(v,J)> (Hellmann-Feynman)
+        fd3 correction is not differentiated
+        '''
+        # fitted params
+        tmp = self._guess_to_params(guess)
+
+        # jacobian rows
+        jac:list[Float64Array] = []
+
+        # columns for de, re, beta only
+        npar = len(guess)
+
+        # exp levels
+        if self.expdata.nlev > 0:
+            levels = self._calc_levels(guess, tmp)
+            _, der_grid = AnPec(tmp).calc_der(levels.r_grid)
+            wf2 = np.array([
+                levels.wavef(j, v)**2
+                for j, en_jv in self.expdata.energy.items()
+                for v in en_jv.keys()
+            ])
+            jac.extend(wf2 @ der_grid[:, :npar] / 0.1)
+
+        # pec
+        _, der = AnPec(tmp).calc_der(self.pec.rvs)
+        jac.extend(- der[:, :npar] / self.pec.evs[:, np.newaxis])
+
+        return np.array(jac)
+
+
+    def _jac_fd(
+        self,
+        guess:list[float]
+    ) -> Float64Array:
+        '''
+        forward-difference jacobian with scipy '2-point' steps EPS_FD * max(1, |x|),
+        perturbed residuals are calculated concurrently in worker pool of params['nproc']
+        '''
+        x_0 = np.asarray(guess, dtype=float)
+        res_0 = np.array(self._res(guess))
+
+        # steps exactly representable in x_0 + step
+        steps = self.EPS_FD * np.where(x_0 >= 0, 1., -1.) * np.maximum(1., np.abs(x_0))
+        steps = (x_0 + steps) - x_0
+        guesses = list(x_0 + np.diag(steps))
+
+        nproc = self.params.get('nproc', 1)
+        process = nproc > 1 and self.params.get('pool', 'process') != 'thread'
+        # eigenvalues only as warm start for worker processes
+        warm = self._levels.warm_copy() if process and self._levels is not None else self._levels
+        res_args = (
+            repeat(self.params),
+            repeat(self.pec),
+            repeat(self.expdata),
+            repeat(self.grid),
+            repeat(warm),
+            guesses
+        )
+        if nproc > 1:
+            executor = ProcessPoolExecutor if process else ThreadPoolExecutor
+            with executor(max_workers=nproc) as pool:
+                res_all = list(pool.map(self._res_fd, *res_args))
+        else:
+            res_all = list(map(self._res_fd, *res_args))
+
+        jac:Float64Array = (np.array(res_all) - res_0).T / steps
+        return jac
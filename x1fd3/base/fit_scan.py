@@ -0,0 +1,139 @@
+from typing import Any, ClassVar
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import numpy.typing as npt
+
+from .p_w_curve import PWCurve
+from .parameters import Parameters
+from .exp_data import ExpData
+from .fit import Fit
+from .logger import Logger
+
+Float64Array = npt.NDArray[np.float64]
+
+class FitScan:
+    '''
+    class for multi-start fits over range of beta orders,
+    ranked by weighted RMS & information criteria AIC, BIC
+    '''
+    # relative difference of RMS treated as tie (converged to the same minimum)
+    RMS_RTOL:ClassVar[float] = 1e-9
+
+    def __init__(
+        self,
+        params:Parameters,
+        pec:PWCurve,
+        expdata:ExpData
+    ) -> None:
+        '''
+        init = run fits for beta orders N = params['nmin'], ..., params['nmax'] (beta_0, ..., beta_N)
+        from params['nstart'] starting points each: initial guess & guesses perturbed by
+        params['spread'] * max(1, |x|) * N(0, 1) with seed params['seed'],
+        fits are spread over worker pool of params['nproc']
+        '''
+        rng = np.random.default_rng(params['seed'])
+
+        tasks:list[tuple[int, int, Float64Array]] = []
+        for order in range(params['nmin'], params['nmax'] + 1):
+            guess_0 = np.zeros(order + 3)
+            guess_0[0] = params['de']
+            guess_0[1] = params['re']
+            nbeta = min(order + 1, len(params['beta']))
+            guess_0[2:2 + nbeta] = params['beta'][:nbeta]
+            for start in range(params['nstart']):
+                guess = guess_0.copy()
+                if start > 0:
+                    guess += params['spread'] * np.maximum(1., np.abs(guess)) * rng.standard_normal(guess.size)
+                tasks.append((order, start, guess))
+
+        fit_args = (
+            repeat(params),
+            repeat(pec),
+            repeat(expdata),
+            [task[2] for task in tasks]
+        )
+        if params['nproc'] > 1 and len(tasks) > 1:
+            executor = ThreadPoolExecutor if params['pool'] == 'thread' else ProcessPoolExecutor
+            with executor(max_workers=params['nproc']) as pool:
+                fits = list(pool.map(self._fit, *fit_args))
+        else:
+            fits = list(map(self._fit, *fit_args))
+
+        # all fits: N, start, weighted RMS, AIC, BIC, fitted params (None if failed)
+        self.results:list[dict[str, Any]] = [
+            {'order': order, 'start': start} | fit
+            for (order, start, _), fit in zip(tasks, fits)
+        ]
+
+        # best fit (min RMS) for each N, lower start on ties within RMS_RTOL
+        self.best:dict[int, dict[str, Any]] = {}
+        for res in self.results:
+            if res['params'] is not None:
+                best = self.best.get(res['order'])
+                if best is None or res['rms'] < best['rms'] * (1 - self.RMS_RTOL):
+                    self.best[res['order']] = res
+
+        if not self.best:
+            raise RuntimeError('all fits of scan FAILED')
+
+    @staticmethod
+    def _fit(
+        params:Parameters,
+        pec:PWCurve,
+        expdata:ExpData,
+        guess:Float64Array
+    ) -> dict[str, Any]:
+        '''
+        single fit from guess (de, re, beta) & its weighted RMS, AIC, BIC,
+        static to be picklable for process pool
+        '''
+        tmp = Parameters()
+        tmp.update(params)
+        tmp['de'] = float(guess[0])
+        tmp['re'] = float(guess[1])
+        tmp['beta'] = np.array(guess[2:])
+
+        fit = Fit(tmp, pec, expdata)
+        try:
+            mes = fit.fit()
+        except (RuntimeError, ValueError, np.linalg.LinAlgError) as err:
+            return {'rms': np.nan, 'aic': np.nan, 'bic': np.nan, 'mes': str(err).strip(), 'params': None}
+
+        res = fit.residual()
+        nres = res.size
+        npar = guess.size
+        rss = float(res @ res)
+
+        return {
+            'rms': (rss / nres)**0.5,
+            'aic': nres * np.log(rss / nres) + 2 * npar,
+            'bic': nres * np.log(rss / nres) + npar * np.log(nres),
+            'mes': mes,
+            'params': tmp
+        }
+
+    def print(
+        self,
+        out:Logger
+    ) -> None:
+        '''
+        print all fits, best fit for each N & best models by AIC, BIC in custom format
+        '''
+        out.print(f'\n=== Scan: {len(self.results)} fits ===\n')
+        out.print(f'{"N":>4}{"start":>6}{"RMS":>15}{"AIC":>15}{"BIC":>15}  status')
+        for res in self.results:
+            status = 'ok' if res['params'] is not None else f'FAILED: {res["mes"]}'
+            out.print(
+                f'{res["order"]:4d}{res["start"]:6d}{res["rms"]:15.6e}{res["aic"]:15.4f}{res["bic"]:15.4f}  {status}'
+            )
+
+        out.print('\n=== Best fit for each N ===\n')
+        out.print(f'{"N":>4}{"start":>6}{"RMS":>15}{"AIC":>15}{"BIC":>15}')
+        for order, res in sorted(self.best.items()):
+            out.print(f'{order:4d}{res["start"]:6d}{res["rms"]:15.6e}{res["aic"]:15.4f}{res["bic"]:15.4f}')
+
+        for crit in ('aic', 'bic'):
+            best = min(self.best.values(), key=lambda res: res[crit])
+            out.print(f'\n=== Best model by {crit.upper()}: N = {best["order"]} ===\n')
+            best['params'].print_pec_params(out)
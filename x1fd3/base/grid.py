@@ -0,0 +1,137 @@
+from typing import ClassVar
+import numpy as np
+import numpy.typing as npt
+
+from .parameters import Parameters
+
+Float64Array = npt.NDArray[np.float64]
+
+class Grid:
+    '''
+    class for uniform R grid & PEC-independent parts of the fd & DVR matrices,
+    instances are cached by (rmin, rmax, step, mass1, mass2) and shared
+    '''
+    # physical constants
+    AU_TO_DA:ClassVar[float] = 5.48579909065e-4
+    AU_TO_CM:ClassVar[float] = 219474.63067
+    A0_TO_ANG:ClassVar[float] = 0.529177210903
+    # min number of grid points
+    NMIN:ClassVar[int] = 100
+    # max number of cached grids
+    NCACHE:ClassVar[int] = 8
+    # number of grid points per block for DVR interpolation
+    NINTERP:ClassVar[int] = 2000
+    # central-difference coefficients of -h^2 d^2/dR^2: diagonal, 1st, 2nd, 3rd off-diagonals
+    STENCILS:ClassVar[dict[str, list[float]]] = {
+        'fd3': [2., -1.],
+        'fd5': [30 / 12, -16 / 12, 1 / 12],
+        'fd7': [490 / 180, -270 / 180, 27 / 180, -2 / 180]
+    }
+
+    _cache:ClassVar[dict[tuple[float, ...], 'Grid']] = {}
+
+    def __init__(
+        self,
+        rmin:float,
+        rmax:float,
+        step:float,
+        mass1:float,
+        mass2:float
+    ) -> None:
+        '''
+        init = build grid, arrays are read-only to be shared safely
+        '''
+        # reduced mass
+        mu = mass1 * mass2 / (mass1 + mass2)
+
+        # h^2 / (2*mu) [cm-1 * A^2]
+        self.scale:float = self.AU_TO_DA * self.AU_TO_CM * self.A0_TO_ANG**2 / (2 * mu)
+        self.step:float = step
+
+        # uniform grid, last point is the nearest to rmax, spacing is exactly step for fd & Richardson
+        self.n:int = round((rmax - rmin) / step) + 1
+        self.r:Float64Array = rmin + step * np.arange(self.n)
+        if self.n < self.NMIN:
+            raise RuntimeError('range ["rmin", "rmax"] seems to be too small')
+
+        # 1 / R^2 for centrifugal term
+        self.r_inv2:Float64Array = self.r**-2
+
+        for arr in (self.r, self.r_inv2):
+            arr.setflags(write=False)
+
+        # kinetic energy for each engine & DVR for each number of points, built on first request
+        self._kinetic:dict[str, tuple[float, Float64Array]] = {}
+        self._dvr:dict[int, tuple[Float64Array, Float64Array]] = {}
+
+    def kinetic(
+        self,
+        engine:str
+    ) -> tuple[float, Float64Array]:
+        '''
+        kinetic energy for engine: diagonal shift & off-diagonal bands (nband x ngrid),
+        band k in lower form of scipy eig_banded, last k elements are not used
+        '''
+        if engine not in self._kinetic:
+            coefs = np.array(self.STENCILS[engine]) * self.step**-2
+            off_bands = np.repeat(coefs[1:, np.newaxis], self.n, axis=1)
+            for k in range(1, coefs.size):
+                off_bands[k - 1, self.n - k:] = 0.
+            off_bands.setflags(write=False)
+            self._kinetic[engine] = (float(coefs[0]), off_bands)
+        return self._kinetic[engine]
+
+    def dvr(
+        self,
+        ndvr:int
+    ) -> tuple[Float64Array, Float64Array]:
+        '''
+        sinc-DVR (Colbert-Miller): ndvr points in [rmin, rmax] & kinetic matrix -d^2/dR^2 (ndvr x ndvr)
+        '''
+        if ndvr not in self._dvr:
+            delta = (self.r[-1] - self.r[0]) / (ndvr - 1)
+            r_dvr = self.r[0] + delta * np.arange(ndvr)
+            dif = np.subtract.outer(np.arange(ndvr), np.arange(ndvr))
+            with np.errstate(divide='ignore'):
+                kin = 2 * (-1.)**dif / (delta * dif)**2
+            np.fill_diagonal(kin, np.pi**2 / 3 / delta**2)
+            for arr in (r_dvr, kin):
+                arr.setflags(write=False)
+            self._dvr[ndvr] = (r_dvr, kin)
+        return self._dvr[ndvr]
+
+    def dvr_interp(
+        self,
+        ndvr:int,
+        coefs:Float64Array
+    ) -> Float64Array:
+        '''
+        sinc interpolation of DVR coefficients (ndvr x nlev) to WFs on the grid (ngrid x nlev),
+        normalised as grid vectors, done in blocks of NINTERP grid points without storing
+        the full (ngrid x ndvr) interpolation matrix
+        '''
+        r_dvr, _ = self.dvr(ndvr)
+        delta = r_dvr[1] - r_dvr[0]
+        wfs = np.empty((self.n, coefs.shape[1]))
+        for start in range(0, self.n, self.NINTERP):
+            r_block = self.r[start:start + self.NINTERP]
+            wfs[start:start + r_block.size] = np.sinc(np.subtract.outer(r_block, r_dvr) / delta) @ coefs
+        wfs *= np.sqrt(self.step / delta)
+        return wfs
+
+    @classmethod
+    def get(
+        cls,
+        params:Parameters,
+        step:float
+    ) -> 'Grid':
+        '''
+        cached grid for given params & step
+        '''
+        key = (params['rmin'], params['rmax'], step, params['mass1'], params['mass2'])
+        if key not in cls._cache:
+            if len(cls._cache) >= cls.NCACHE:
+                # drop oldest
+                del cls._cache[next(iter(cls._cache))]
+            cls._cache[key] = cls(*key)
+        return cls._cache[key]
@@ -1,13 +1,20 @@
-from typing import ClassVar, Any
+from typing import ClassVar, Any, Callable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+from contextlib import ExitStack
+from copy import copy
+from os.path import join
+from tempfile import TemporaryDirectory
 import numpy as np
 import numpy.typing as npt
-from scipy.linalg import eigh_tridiagonal     # type: ignore
+from scipy.linalg import eigh, eigh_tridiagonal, eigvals_banded, solve_banded     # type: ignore
 
 from .p_w_curve import PWCurve
 from .parameters import Parameters
 from .an_pec import AnPec
 from .logger import Logger
 from .exp_data import ExpData
+from .grid import Grid
 
 Float64Array = npt.NDArray[np.float64]
 
@@ -16,20 +23,63 @@ class Levels:
     class for vib-rot level
     '''
     # physical constants
-    AU_TO_DA:ClassVar[float] = 5.48579909065e-4
-    AU_TO_CM:ClassVar[float] = 219474.63067
-    A0_TO_ANG:ClassVar[float] = 0.529177210903
-    # grid step
-    STEP:ClassVar[float] = 1e-4
+    AU_TO_DA:ClassVar[float] = Grid.AU_TO_DA
+    AU_TO_CM:ClassVar[float] = Grid.AU_TO_CM
+    A0_TO_ANG:ClassVar[float] = Grid.A0_TO_ANG
+    # leading error orders in step for E(J = 0), E(J > 0) & Bv for each engine,
+    # fd3 correction omits centrifugal term, so E(J > 0) has h^2 term
+    ORDERS:ClassVar[dict[str, tuple[int, int, int]]] = {
+        'fd3': (4, 2, 2),
+        'fd5': (4, 4, 4),
+        'fd7': (6, 6, 6)
+    }
+    # inverse iteration for banded engines: number of iterations & relative shift
+    NITER:ClassVar[int] = 2
+    SHIFT_REL:ClassVar[float] = 1e-12
+    # Rayleigh quotient iteration for warm start: max number of iterations & tolerance rel. to matrix norm
+    NRQI:ClassVar[int] = 6
+    RQI_TOL:ClassVar[float] = 1e-15
+    # number of grid points for coarse solution in grid trimming
+    NTRIM:ClassVar[int] = 2000
 
     def __init__(
         self,
         params:Parameters,
         pec:PWCurve,
-        expdata:ExpData
+        expdata:ExpData,
+        vlist:list[int] | None = None,
+        eigvals_only:bool = False,
+        jmin:int = 0,
+        grid:Grid | None = None,
+        energies_only:bool = False,
+        warm:'Levels | None' = None,
+        exp_wf:bool = False
     ) -> None:
         '''
         init = calculate vib-rot levels for given set of parameters / point-wise pec
+        if vlist provided, only bound levels with these v are calculated and stored,
+        levels are further limited by params vmin, vmax (ENERGY), jmaxv (max J for each v)
+        & emax (max energy), index windows are used for J whenever requested v are known
+        if eigvals_only, only energies without fd3 correction are calculated (no Bv & WF)
+        if energies_only, only energies with fd3 correction are calculated (no Bv):
+        WFs from inverse iteration are reduced to moments in solver and not kept,
+        if exp_wf, WFs of exp levels are kept as float64 instead (e.g. for analytic jacobian of fit),
+        wavef(j, v) recalculates missing WF on demand from the eigenvalue (fd engines)
+        if warm (energies only levels on the same grid, e.g. previous fit iteration) is given,
+        its eigenvalues are refined by Rayleigh quotient iteration instead of full solution
+        engine from params['engine']: fd3 (tridiagonal, reference), fd5, fd7 (banded, no correction)
+        or dvr (sinc-DVR with params['ndvr'] points, r_grid & WFs on DVR points,
+        Grid.dvr_interp gives WFs on the grid with step if needed)
+        without exp levels J from jmin to params['jmax'] are used,
+        params['jmax'] < 0 (auto): J from jmin upward until no bound levels left (all bound levels)
+        grid is taken from cache (trimmed if params['trim'] > 0) if not provided,
+        only PEC-dependent diagonal is built here
+        if params['richardson'] > 1, E & Bv are extrapolated with grids step, 2*step (& 4*step)
+        if params['centrifugal'] == 'hutson', only J = 0 & anchor J are diagonalized,
+        other J from centrifugal distortion constants, WFs for J = 0 & anchor J only
+        WFs are stored according to params['wfstore']:
+        full (float64), float32, support (|psi| > wftol * max|psi| only), mmap (.npy on disk) or none,
+        temporary files of mmap are removed by close() (or on exit from with block)
         '''
         # save exp levels
         self.energy_exp = expdata.energy
@@ -38,87 +88,1066 @@ class Levels:
         # empty vars for calc levels
         self.energy:dict[int, dict[int, float]] = {}
         self.rot_const:dict[int, dict[int, float]] = {}
-        self.wavef_grid:dict[int, dict[int, Float64Array]] = {}
+        self.wavef_grid:dict[int, dict[int, npt.NDArray[Any]]] = {}
+        self.wavef_offset:dict[int, dict[int, int]] = {}
         self.r_grid:Float64Array = np.array([])
 
-        # reduced mass
-        mu = params['mass1'] * params['mass2'] / (params['mass1'] + params['mass2'])
+        # energies only: eigenvalues & J-independent band for WFs on demand
+        self._eigvals:dict[int, dict[int, float]] = {}
+        self._band:tuple[Float64Array, Float64Array, Float64Array] | None = None
 
-        # h^2 / (2*mu) [cm-1 * A^2]
-        scale = self.AU_TO_DA * self.AU_TO_CM * self.A0_TO_ANG**2 / (2 * mu)
+        # error estimates for Richardson extrapolation
+        self.energy_err:dict[int, dict[int, float]] = {}
+        self.rot_const_err:dict[int, dict[int, float]] = {}
 
-        # grid
-        step = self.STEP
-        r_grid = np.arange(params['rmin'], params['rmax'] + step / 2, step)
-        n_grid = r_grid.size
-        if n_grid < 1000:
-            raise RuntimeError('range ["rmin", "rmax"] seems to be too small')
+        # engine: fd3 (tridiagonal + correction), fd5 or fd7 (banded), dvr (dense)
+        self.engine:str = params['engine']
 
-        if pec.npoint > 0:
-            # cubic spline for pw pec
-            u_grid = pec.spline(r_grid)
-            emax = u_grid[-1] / scale
-        else:
-            # analytic
-            if 'ptype' in params.keys():
-                u_grid = AnPec(params).calc(r_grid)
-                if params['ptype'] in ('EMO', 'MLR', 'DELR'):
-                    emax = params['de'] / scale
-                else:
-                    raise RuntimeError(f'cant calculate energy range for \"{params["ptype"]}\"')
-            else:
-                raise RuntimeError('"ptype" not in Parameters.keys()')
+        # J dependence: exact (diagonalization for each J) or hutson (centrifugal distortion constants)
+        self.centrifugal:str = params['centrifugal']
+        self.cd_const:dict[int, Float64Array] = {}
+
+        # WF storage policy
+        self.wfstore:str = params['wfstore']
+        self.wftol:float = params['wftol']
+        self._wfdir:TemporaryDirectory[str] | None = None
+        if self.wfstore == 'mmap' and not (eigvals_only or energies_only):
+            self._wfdir = TemporaryDirectory(prefix='x1fd3_wf_')
+
+        # PEC & max energy [cm-1]
+        calc_pec, emax_cm = self._calc_pec(params, pec)
 
-        # J and eigenvalues search ranges
+        # grid & h^2 / (2*mu) [cm-1 * A^2], trimmed if params['trim'] > 0
+        if grid is None:
+            grid = self.get_grid(params, pec, expdata, vlist)
+        self.grid:Grid = grid
+        self.grid_full:Grid = Grid.get(params, grid.step)
+        scale = grid.scale
+        step = grid.step
+        r_grid = grid.r
+        n_grid = grid.n
+
+        emax = emax_cm / scale
+
+        # requested v with max J & energy window
+        vsel = self.get_vsel(params, vlist) if self.nlev_exp == 0 else None
+        if params['emax'] > 0:
+            emax = min(emax, params['emax'] / scale)
+
+        # J and eigenvalues search ranges: by index ('i') or by energy ('v') for each J,
+        # for jmax auto filled J by J while searching bound levels
         select_range:dict[int, tuple[Any, Any]] = {}
+        selects:dict[int, str] = {}
+        jtop = max(vsel.values()) if vsel else params.get('jmax', 0)
+        jauto = self.nlev_exp == 0 and jtop < 0
         if self.nlev_exp > 0:
             jrange = self.energy_exp.keys()
-            select = 'i'
             for j in jrange:
+                selects[j] = 'i'
                 select_range[j] = (
                     min(self.energy_exp[j].keys()),
                     max(self.energy_exp[j].keys())
                 )
+        elif jauto:
+            jrange = range(0) #type: ignore
+        elif vsel:
+            jrange = range(jmin, jtop + 1) #type: ignore
+            for j in jrange:
+                vs_j = [v for v, jlim in vsel.items() if j <= jlim]
+                selects[j] = 'i'
+                select_range[j] = (min(vs_j), max(vs_j))
         else:
-            jrange = range(params['jmax'] + 1) #type: ignore
-            select = 'v'
+            jrange = range(jmin, jtop + 1) #type: ignore
+            for j in jrange:
+                if params['vmin'] > 0:
+                    # index from vmin up to emax
+                    selects[j] = 'vi'
+                    select_range[j] = (params['vmin'], emax)
+                else:
+                    selects[j] = 'v'
+                    select_range[j] = (0., emax)
 
-        # loop over J to calculate level energies
-        for j in jrange:
-            # diagonal elements (ngrid)
-            diagonal = u_grid / scale + j * (j + 1) * r_grid**-2 + 2 * step**-2
+        # energies only: WFs of exp levels are kept if requested,
+        # otherwise moments for fd3 correction are calculated in solver & other engines need no WFs
+        keep_wf = energies_only and exp_wf and self.nlev_exp > 0
+        fd_moments = energies_only and not keep_wf and self.engine == 'fd3'
+        solver_eigvals_only = eigvals_only or (energies_only and not keep_wf)
 
-            # off-diagonal elements (ngrid-1)
-            off_diag = np.full(n_grid - 1, -step**-2)
+        # J-independent parts of the banded matrix or dense DVR matrix
+        # & columns (npoint x 4) for moments <U^2>, <U>, <1/R^2>, <1> of all WFs at once,
+        # on DVR points for dvr (quadrature over DVR coefficients), PEC is not needed on the grid,
+        # WFs of dvr are kept on DVR points as output grid
+        if self.engine == 'dvr':
+            r_dvr, kin_dvr = grid.dvr(params['ndvr'])
+            r_grid = r_dvr
+            u_dvr = calc_pec(r_dvr)
+            aux = np.stack([u_dvr**2, u_dvr, r_dvr**-2, np.ones(r_dvr.size)], axis=1)
+            solver = self._solve_j_dvr
+            matrix_args = (u_dvr / scale, r_dvr**-2, kin_dvr)
+        else:
+            u_grid = calc_pec(r_grid)
+            r_inv2 = grid.r_inv2
+            aux = np.stack([u_grid**2, u_grid, r_inv2, np.ones(n_grid)], axis=1)
+            kin_diag, off_bands = grid.kinetic(self.engine)
+            solver = self._solve_j
+            matrix_args = (u_grid / scale + kin_diag, r_inv2, off_bands, aux if fd_moments else None)
+            if energies_only:
+                self._band = (matrix_args[0], r_inv2, off_bands)
 
-            # SciPy routine to calculate eigenvalues and eigenvectors
-            results = eigh_tridiagonal(
-                diagonal,
-                off_diag,
-                select=select,
-                select_range=select_range.get(j, (0., emax))
+        # diagonalization for each J, optionally spread over worker pool,
+        # only J = 0 & anchor J for Hutson centrifugal distortion
+        jlist = list(jrange)
+        if self.centrifugal == 'hutson':
+            if eigvals_only or energies_only or self.engine == 'dvr' or 0 not in jlist:
+                raise RuntimeError('Hutson centrifugal distortion requires WFs, fd engine & J = 0')
+            jall = jlist
+            # jmax is always anchor: each J has anchor J' >= J for error estimate
+            anchors = sorted(({j for j in params['janchor'] if 0 < j <= jall[-1]} | {jall[-1]}) - {0})
+            jlist = [0] + anchors
+        with ExitStack() as stack:
+            if params['nproc'] > 1 and (len(jlist) > 1 or jauto):
+                executor = ThreadPoolExecutor if params['pool'] == 'thread' else ProcessPoolExecutor
+                pool_map = stack.enter_context(executor(max_workers=params['nproc'])).map
+            else:
+                pool_map = map
+
+            if jauto:
+                jlist, results_all = self._solve_auto(
+                    pool_map, solver, matrix_args, selects, select_range,
+                    list(vsel) if vsel else None, params['vmin'], emax, jmin, params['nproc'],
+                    solver_eigvals_only
+                )
+            else:
+                # warm start from eigenvalues of previous levels on the same grid
+                warm_args:tuple[list[Float64Array | None], ...] = ()
+                if (
+                    warm is not None and warm._eigvals and warm.grid is grid
+                    and warm.engine == self.engine and self.engine != 'dvr'
+                ):
+                    solver = self._refine_j
+                    warm_args = ([
+                        self._warm_eigvals(warm, j, selects[j], select_range[j]) for j in jlist
+                    ],)
+                results_all = list(pool_map(
+                    solver,
+                    *map(repeat, matrix_args),
+                    jlist,
+                    [selects[j] for j in jlist],
+                    [select_range[j] for j in jlist],
+                    repeat(solver_eigvals_only),
+                    *warm_args
+                ))
+
+        # loop over J to process eigenpairs, same order as in jrange
+        for j, results in zip(jlist, results_all):
+            # first v in results
+            v_0 = select_range[j][0] if selects[j] in ('i', 'vi') else 0
+
+            # levels to keep: requested bound levels
+            vs = v_0 + np.arange(results[0].size)
+            if self.nlev_exp > 0:
+                keep = np.full(vs.size, True)
+            else:
+                keep = (results[0] <= emax) & (vs >= params['vmin'])
+                if vsel:
+                    keep &= np.isin(vs, [v for v, jlim in vsel.items() if jlim < 0 or j <= jlim])
+            vs = vs[keep]
+            ens = results[0][keep] * scale
+
+            if energies_only:
+                self._eigvals[j] = dict(zip(vs.tolist(), results[0][keep].tolist()))
+
+            if solver_eigvals_only and not fd_moments:
+                # E only, fd3 correction requires WF
+                self.energy[j] = dict(zip(vs.tolist(), ens.tolist()))
+                self.rot_const[j] = {}
+                continue
+
+            if fd_moments:
+                # moments (nlev x 4) from solver
+                moments = results[1][keep]
+            else:
+                # moments for all WFs (nlev x 4)
+                wfs = results[1][:, keep]
+                moments = (wfs**2).T @ aux
+
+            # correction for fd3 scheme: step^2/12 * <(U - E)^2> / scale, not needed for other engines
+            fd_cor = step**2 / scale / 12 * (
+                moments[:, 0] - 2 * ens * moments[:, 1] + ens**2 * moments[:, 3]
+            ) if self.engine == 'fd3' else 0.
+
+            # E, Bv, WF
+            self.energy[j] = dict(zip(vs.tolist(), (ens + fd_cor).tolist()))
+            if energies_only:
+                self.rot_const[j] = {}
+                if keep_wf:
+                    self.wavef_grid[j] = {
+                        v: wfs[:, n] for n, v in enumerate(vs.tolist()) if v in self.energy_exp[j]
+                    }
+                    self.wavef_offset[j] = dict.fromkeys(self.wavef_grid[j], 0)
+                continue
+            self.rot_const[j] = dict(zip(vs.tolist(), (scale * moments[:, 2]).tolist()))
+            self._store_wavef(j, vs.tolist(), wfs.T)
+
+            if j == 0 and self.centrifugal == 'hutson':
+                # J = 0 eigenpairs & moments for centrifugal distortion constants
+                hutson_0 = (vs.tolist(), ens / scale, wfs, moments)
+
+        # grid for R
+        self.r_grid = r_grid
+
+        if self.centrifugal == 'hutson':
+            self._hutson(
+                jall,
+                anchors,
+                np.vstack([matrix_args[0], matrix_args[2]]),
+                r_inv2,
+                hutson_0,
+                params['ncd'],
+                emax,
+                vsel
             )
 
-            # dicts for results
+        if params['richardson'] > 1 and not eigvals_only:
+            self._extrapolate(params, pec, expdata, vlist, jmin, energies_only)
+
+    def close(
+        self
+    ) -> None:
+        '''
+        remove temporary directory of memory-mapped WFs (wfstore mmap), stored WFs are dropped
+        '''
+        if self._wfdir is not None:
+            self.wavef_grid = {}
+            self.wavef_offset = {}
+            self._wfdir.cleanup()
+            self._wfdir = None
+
+    def __enter__(
+        self
+    ) -> 'Levels':
+        '''
+        levels as context manager, see close()
+        '''
+        return self
+
+    def __exit__(
+        self,
+        *exc:Any
+    ) -> None:
+        '''
+        close() on exit from with block
+        '''
+        self.close()
+
+    def warm_copy(
+        self
+    ) -> 'Levels':
+        '''
+        shallow copy with eigenvalues, grid & engine only as warm start for other levels,
+        cheap to pickle for process pool (no WFs, energies, full grid)
+        '''
+        warm = copy(self)
+        warm.energy = {}
+        warm.rot_const = {}
+        warm.wavef_grid = {}
+        warm.wavef_offset = {}
+        warm.r_grid = np.array([])
+        warm.cd_const = {}
+        warm.energy_err = {}
+        warm.rot_const_err = {}
+        warm.grid_full = self.grid
+        warm._band = None
+        warm._wfdir = None
+        return warm
+
+    @staticmethod
+    def _solve_auto(
+        pool_map:Callable[..., Any],
+        solver:Callable[..., Any],
+        matrix_args:tuple[Any, ...],
+        selects:dict[int, str],
+        select_range:dict[int, tuple[Any, Any]],
+        vlist:list[int] | None,
+        vmin:int,
+        emax:float,
+        jmin:int,
+        nproc:int,
+        eigvals_only:bool
+    ) -> tuple[list[int], list[Any]]:
+        '''
+        all bound levels: J from jmin upward in blocks of nproc until J without bound levels,
+        E(v,J) grows with J, so bound v of J are subset of bound v of J-1
+        and search window of each block is limited by bound v of previous block
+        '''
+        jlist:list[int] = []
+        results_all:list[Any] = []
+        vlo = min(vlist) if vlist else vmin
+        vhi = max(vlist) if vlist else None
+
+        j = jmin
+        while True:
+            block = list(range(j, j + max(nproc, 1)))
+            for jb in block:
+                if vhi is not None:
+                    # by index: v from vlist or bound v of previous J
+                    selects[jb] = 'i'
+                    select_range[jb] = (vlo, vhi)
+                elif vmin > 0:
+                    # first J: levels below dissociation from vmin
+                    selects[jb] = 'vi'
+                    select_range[jb] = (vmin, emax)
+                else:
+                    # first J: all levels below dissociation
+                    selects[jb] = 'v'
+                    select_range[jb] = (0., emax)
+
+            results_block = list(pool_map(
+                solver,
+                *map(repeat, matrix_args),
+                block,
+                [selects[jb] for jb in block],
+                [select_range[jb] for jb in block],
+                repeat(eigvals_only)
+            ))
+
+            for jb, results in zip(block, results_block):
+                nbound = np.count_nonzero(results[0] <= emax)
+                if nbound == 0:
+                    return jlist, results_all
+                jlist.append(jb)
+                results_all.append(results)
+                vtop = (select_range[jb][0] if selects[jb] in ('i', 'vi') else 0) + nbound - 1
+
+            vhi = vtop if vhi is None else min(vhi, vtop)
+            j += len(block)
+
+    @staticmethod
+    def get_vsel(
+        params:Parameters,
+        vlist:list[int] | None = None
+    ) -> dict[int, int] | None:
+        '''
+        requested v & max J for each v (< 0 for jmax auto) from vlist & params vmin, vmax, jmaxv
+        (max J of v-th level, only these v), None if all bound v are requested
+        '''
+        vmin = params['vmin']
+        vmax = params.get('vmax', -1)
+        jmaxv = params['jmaxv']
+        jmax = params['jmax']
+
+        if vlist:
+            vs = list(vlist)
+        elif jmaxv:
+            vs = list(range(len(jmaxv)))
+        elif vmax >= 0:
+            vs = list(range(vmin, vmax + 1))
+        else:
+            return None
+
+        vsel:dict[int, int] = {}
+        for v in vs:
+            if v < vmin or 0 <= vmax < v or (jmaxv and v >= len(jmaxv)):
+                if vlist:
+                    raise RuntimeError(f'requested v = {v} is excluded by "vmin", "vmax" or "jmaxv"')
+                continue
+            if jmaxv:
+                vsel[v] = min(jmaxv[v], jmax) if jmax >= 0 else jmaxv[v]
+            else:
+                vsel[v] = jmax
+
+        if not vsel:
+            raise RuntimeError('no levels requested: check "vmin", "vmax" & "jmaxv"')
+        return vsel
+
+    @staticmethod
+    def _calc_pec(
+        params:Parameters,
+        pec:PWCurve
+    ) -> tuple[Callable[[Float64Array], Float64Array], float]:
+        '''
+        PEC function (point-wise spline or analytic) & max energy of bound levels [cm-1]
+        '''
+        if pec.npoint > 0:
+            # cubic spline for pw pec
+            return pec.spline, float(pec.spline(np.array([params['rmax']]))[0])
+
+        # analytic
+        if 'ptype' in params.keys():
+            if params['ptype'] in ('EMO', 'MLR', 'DELR'):
+                return AnPec(params).calc, params['de']
+            raise RuntimeError(f'cant calculate energy range for \"{params["ptype"]}\"')
+        raise RuntimeError('"ptype" not in Parameters.keys()')
+
+    @classmethod
+    def get_grid(
+        cls,
+        params:Parameters,
+        pec:PWCurve,
+        expdata:ExpData,
+        vlist:list[int] | None = None
+    ) -> Grid:
+        '''
+        cached grid for params, if params['trim'] > 0 trimmed to classically allowed region
+        of the highest requested level (exp levels, vlist or up to dissociation) plus
+        tunnelling margin where WKB decay exp(-int kappa dR) reaches params['trim']
+        '''
+        grid = Grid.get(params, params['step'])
+        if params['trim'] <= 0:
+            return grid
+
+        calc_pec, emax = cls._calc_pec(params, pec)
+
+        if params['emax'] > 0:
+            emax = min(emax, params['emax'])
+
+        # highest requested level: v & J
+        vtop = None
+        if expdata.nlev > 0:
+            vtop = max(max(en_jv.keys()) for en_jv in expdata.energy.values())
+            jtop = max(expdata.energy.keys())
+        else:
+            vsel = cls.get_vsel(params, vlist)
+            if vsel and max(vsel.values()) >= 0:
+                vtop = max(vsel)
+                jtop = max(vsel.values())
+
+        # its energy for J = 0 & jtop from fast coarse fd7 solution
+        etop = emax
+        if vtop is not None:
+            tmp = Parameters()
+            tmp.update(params)
+            tmp.update({
+                'engine': 'fd7',
+                'step': max(params['step'], (params['rmax'] - params['rmin']) / cls.NTRIM),
+                'trim': 0.,
+                'richardson': 0,
+                'centrifugal': 'exact'
+            })
+            ens:list[float] = []
+            for j in sorted({0, jtop}):
+                # single J for each call
+                tmp['jmax'] = j
+                ens.extend(Levels(tmp, pec, ExpData(), [vtop], eigvals_only=True, jmin=j).energy.get(j, {}).values())
+            if ens:
+                etop = min(max(ens), emax)
+
+        # classically allowed region at J = 0
+        u_grid = calc_pec(grid.r)
+        allowed = np.flatnonzero(u_grid < etop)
+        if allowed.size == 0:
+            return grid
+        i_in, i_out = allowed[0], allowed[-1]
+
+        # WKB decay beyond turning points
+        kappa = np.sqrt(np.maximum(u_grid - etop, 0.) / grid.scale)
+        decay = np.log(1 / params['trim'])
+        dec_in = np.cumsum(kappa[i_in::-1]) * grid.step
+        dec_out = np.cumsum(kappa[i_out:]) * grid.step
+        i_min = i_in - min(np.searchsorted(dec_in, decay), i_in)
+        i_max = i_out + min(np.searchsorted(dec_out, decay), grid.n - 1 - i_out)
+
+        tmp = Parameters()
+        tmp.update(params)
+        tmp['rmin'] = float(grid.r[i_min])
+        tmp['rmax'] = float(grid.r[i_max])
+
+        return Grid.get(tmp, params['step'])
+
+    def print_grid(
+        self,
+        out:Logger
+    ) -> None:
+        '''
+        print grid reduction if grid was trimmed
+        '''
+        if self.grid is not self.grid_full:
+            out.print(
+                f'\n=== Grid trimmed: [{self.grid_full.r[0]:.4f}, {self.grid_full.r[-1]:.4f}] A -> ' +
+                f'[{self.grid.r[0]:.4f}, {self.grid.r[-1]:.4f}] A, ' +
+                f'{self.grid_full.n} -> {self.grid.n} points ({100 * (1 - self.grid.n / self.grid_full.n):.1f}% cut) ==='
+            )
+
+    def _hutson(
+        self,
+        jall:list[int],
+        anchors:list[int],
+        a_band:Float64Array,
+        r_inv2:Float64Array,
+        hutson_0:tuple[list[int], Float64Array, Float64Array, Float64Array],
+        ncd:int,
+        emax:float,
+        vsel:dict[int, int] | None
+    ) -> None:
+        '''
+        E(v,J) & Bv(J) for all J from centrifugal distortion constants
+        E = sum K_n [J(J+1)]^n, K_0 = Gv, K_1 = Bv, K_2 = -Dv, K_3 = Hv, ...,
+        error estimate = deviation from exact levels at nearest anchor J' >= J,
+        levels of divergent series are dropped: (v, J) not bound at anchor J' >= J
+        or E(v,J) decreasing with J (so below E(v,0)) from this J on
+        '''
+        scale = self.grid.scale
+        step = self.grid.step
+        vs0, eigvals0, wfs0, moments0 = hutson_0
+
+        # K_n with K_0 without fd3 correction for series, Gv = E(v,0) in cd_const
+        kn_all:dict[int, Float64Array] = {}
+        for n, v in enumerate(vs0):
+            kn_all[v] = self._cd_constants(a_band, r_inv2, eigvals0[n], wfs0[:, n], ncd) * scale
+            self.cd_const[v] = np.concatenate([[self.energy[0][v]], kn_all[v][1:]])
+
+        # exact levels at anchors
+        exact = {j: (self.energy[j], self.rot_const[j]) for j in anchors}
+
+        # series values of previous J for v not dropped yet
+        en_prev = {v: float(kn[0]) for v, kn in kn_all.items()}
+
+        for j in jall:
+            lam = j * (j + 1)
+            janc = next((ja for ja in anchors if ja >= j), None)
             self.energy[j] = {}
             self.rot_const[j] = {}
-            self.wavef_grid[j] = {}
-
-            # calc correction for E(v,J) and store results
-            for v, en in enumerate(results[0]):
-                wf = results[1][:, v]
-                # correction for fd3 scheme
-                fd_cor = step**2 / scale / 12 * np.sum(
-                    (wf * (u_grid - en * scale))**2
+            for n, v in enumerate(vs0):
+                if v not in en_prev:
+                    continue
+                kn = kn_all[v]
+                en = float(np.polynomial.polynomial.polyval(lam, kn))
+                if en > emax * scale or (vsel and j > vsel[v]):
+                    continue
+                if en < en_prev[v] or (j > 0 and janc is not None and v not in exact[janc][0]):
+                    # divergent series or unbound level
+                    del en_prev[v]
+                    continue
+                en_prev[v] = en
+                # correction for fd3 scheme with J = 0 WF
+                fd_cor = step**2 / scale / 12 * (
+                    moments0[n, 0] - 2 * en * moments0[n, 1] + en**2 * moments0[n, 3]
+                ) if self.engine == 'fd3' else 0.
+                self.energy[j][v] = en + fd_cor
+                self.rot_const[j][v] = float(
+                    np.polynomial.polynomial.polyval(lam, kn[1:] * np.arange(1, ncd + 1))
                 )
 
-                # E, Bv, WF
-                self.energy[j][v] = en * scale + fd_cor
-                self.rot_const[j][v] = scale * np.sum(wf**2 * r_grid**-2)
-                self.wavef_grid[j][v] = wf
+        # errors at anchors
+        for j in anchors:
+            en_ex, rot_ex = exact[j]
+            self.energy_err[j] = {v: abs(en - en_ex[v]) if v in en_ex else np.nan for v, en in self.energy[j].items()}
+            self.rot_const_err[j] = {v: abs(rc - rot_ex[v]) if v in rot_ex else np.nan for v, rc in self.rot_const[j].items()}
 
-        # grid for R
-        self.r_grid = r_grid
+        # errors for other J from nearest anchor J >= J
+        for j in jall:
+            if j in anchors:
+                continue
+            janc = next((ja for ja in anchors if ja > j), None)
+            for errs in (self.energy_err, self.rot_const_err):
+                if j == 0:
+                    errs[j] = dict.fromkeys(self.energy[j], 0.)
+                else:
+                    errs[j] = {v: errs[janc].get(v, np.nan) if janc else np.nan for v in self.energy[j]}
+
+        self.energy_err = dict(sorted(self.energy_err.items()))
+        self.rot_const_err = dict(sorted(self.rot_const_err.items()))
+
+        # levels without error estimate are dropped
+        for j in jall:
+            for v in [v for v, err in self.energy_err[j].items() if np.isnan(err)]:
+                for vals in (self.energy, self.rot_const, self.energy_err, self.rot_const_err):
+                    del vals[j][v]
+
+    @staticmethod
+    def _cd_constants(
+        a_band:Float64Array,
+        r_inv2:Float64Array,
+        eigval:float,
+        wf0:Float64Array,
+        ncd:int
+    ) -> Float64Array:
+        '''
+        K_0, ..., K_ncd (in units of scale) by Rayleigh-Schroedinger recursion (Hutson):
+        K_n = <f0|1/R^2|f(n-1)>, (A - K_0) f(n) = -f(n-1)/R^2 + sum_k K_k f(n-k), <f0|f(n)> = 0,
+        singular banded system is solved without row & column at max |f0|
+        '''
+        nband = a_band.shape[0] - 1
+        n_grid = wf0.size
+        m = int(np.abs(wf0).argmax())
+        idx = np.delete(np.arange(n_grid), m)
+
+        # lower form of (A - K_0) without row & column m, bandwidth is kept
+        red = np.zeros((nband + 1, n_grid - 1))
+        for k in range(nband + 1):
+            dif = idx[k:] - idx[:n_grid - 1 - k]
+            red[k, :n_grid - 1 - k] = np.where(
+                dif <= nband,
+                a_band[np.minimum(dif, nband), idx[:n_grid - 1 - k]],
+                0.
+            )
+        red[0] -= eigval
+        ab = Levels._full_band(red)
+
+        wfn = [wf0]
+        kn = [eigval]
+        for n in range(1, ncd + 1):
+            kn.append(float(wf0 @ (r_inv2 * wfn[-1])))
+            if n == ncd:
+                break
+            rhs = - r_inv2 * wfn[-1] + sum(kn[k] * wfn[n - k] for k in range(1, n + 1))
+            rhs -= (wf0 @ rhs) * wf0
+            wf = np.zeros(n_grid)
+            wf[idx] = solve_banded((nband, nband), ab, rhs[idx], check_finite=False)
+            wf -= (wf0 @ wf) * wf0
+            wfn.append(wf)
+
+        return np.array(kn)
+
+    def _extrapolate(
+        self,
+        params:Parameters,
+        pec:PWCurve,
+        expdata:ExpData,
+        vlist:list[int] | None,
+        jmin:int,
+        energies_only:bool
+    ) -> None:
+        '''
+        Richardson extrapolation of E & Bv (E only if energies_only) with levels on coarser grids
+        2*step (& 4*step), error estimate = difference between two last extrapolations,
+        levels missing on coarser grids are not extrapolated (NaN error)
+        '''
+        tmp = Parameters()
+        tmp.update(params)
+        tmp['richardson'] = 0
+        tmp['wfstore'] = 'none'
+        tmp['trim'] = 0.
+        tmp['rmin'] = float(self.grid.r[0])
+        tmp['rmax'] = float(self.grid.r[-1])
+        # same J on coarser grids instead of search for bound levels
+        tmp['jmax'] = max(self.energy.keys(), default=jmin)
+
+        coarse = [
+            Levels(
+                tmp, pec, expdata, vlist, jmin=jmin,
+                grid=Grid.get(tmp, self.grid.step * 2**k), energies_only=energies_only
+            )
+            for k in range(1, params['richardson'])
+        ]
+
+        order_e0, order_e, order_b = self.ORDERS[self.engine]
+
+        for j, en_jv in self.energy.items():
+            vs = [v for v in en_jv if all(v in lev.energy.get(j, {}) for lev in coarse)]
+            self.energy_err[j] = dict.fromkeys(en_jv, np.nan)
+            self.rot_const_err[j] = dict.fromkeys(self.rot_const[j], np.nan)
+            if not vs:
+                continue
+
+            for vals, errs, order, attr in (
+                (self.energy, self.energy_err, order_e0 if j == 0 else order_e, 'energy'),
+                (self.rot_const, self.rot_const_err, order_b, 'rot_const')
+            )[:1 if energies_only else 2]:
+                # (ngrid x nlev), steps h, 2h, 4h
+                seq = np.array(
+                    [[vals[j][v] for v in vs]] +
+                    [[getattr(lev, attr)[j][v] for v in vs] for lev in coarse]
+                )
+                ext, err = self._richardson(seq, order)
+                vals[j].update(zip(vs, ext.tolist()))
+                errs[j].update(zip(vs, err.tolist()))
+
+    @staticmethod
+    def _richardson(
+        seq:Float64Array,
+        order:int
+    ) -> tuple[Float64Array, Float64Array]:
+        '''
+        Romberg table for values (ngrid x nlev) on steps h, 2h, 4h
+        with error ~ h^order + h^(order+2) + ...
+        '''
+        tab = seq
+        prev = seq[0]
+        for k in range(seq.shape[0] - 1):
+            fac = 2.**(order + 2 * k)
+            prev = tab[0]
+            tab = (fac * tab[:-1] - tab[1:]) / (fac - 1)
+        return tab[0], np.abs(tab[0] - prev)
+
+    def _store_wavef(
+        self,
+        j:int,
+        vstored:list[int],
+        wfs:Float64Array
+    ) -> None:
+        '''
+        store WFs (nlev x ngrid) for given J according to storage policy
+        '''
+        self.wavef_grid[j] = {}
+        self.wavef_offset[j] = {}
+
+        if self.wfstore == 'none':
+            return
+
+        if self._wfdir is not None:
+            fname = join(self._wfdir.name, f'wf_{j}.npy')
+            np.save(fname, wfs)
+            wfs = np.load(fname, mmap_mode='r')
+
+        for n, v in enumerate(vstored):
+            wf = wfs[n]
+            offset = 0
+            if self.wfstore == 'float32':
+                wf = wf.astype(np.float32)
+            elif self.wfstore == 'support':
+                wf_abs = np.abs(wf)
+                support = np.flatnonzero(wf_abs > self.wftol * wf_abs.max())
+                offset = int(support[0])
+                wf = wf[offset:support[-1] + 1].copy()
+            self.wavef_grid[j][v] = wf
+            self.wavef_offset[j][v] = offset
+
+    def wavef(
+        self,
+        j:int,
+        v:int
+    ) -> Float64Array:
+        '''
+        WF for (v, J) on the full grid as float64 for any storage policy,
+        for energies only (if not kept) by inverse iteration with the eigenvalue
+        '''
+        if self._eigvals and v not in self.wavef_grid.get(j, {}):
+            if self._band is None:
+                raise RuntimeError('WFs on demand are available for fd engines only')
+            diag_0, r_inv2, off_bands = self._band
+            a_band = np.vstack([diag_0 + j * (j + 1) * r_inv2, off_bands])
+            wf:Float64Array = self._inverse_iteration(a_band, np.array([self._eigvals[j][v]]))[:, 0]
+            return wf
+
+        if self.wfstore == 'none' and v not in self.wavef_grid.get(j, {}):
+            raise RuntimeError('WFs are not stored, "wfstore none" is given')
+
+        stored = self.wavef_grid[j][v]
+        if self.wfstore in ('full', 'mmap'):
+            return np.asarray(stored, dtype=float)
+
+        wf = np.zeros(self.r_grid.size)
+        offset = self.wavef_offset[j][v]
+        wf[offset:offset + stored.size] = stored
+        return wf
+
+    @staticmethod
+    def _solve_j(
+        diag_0:Float64Array,
+        r_inv2:Float64Array,
+        off_bands:Float64Array,
+        aux:Float64Array | None,
+        j:int,
+        select:str,
+        select_range:tuple[Any, Any],
+        eigvals_only:bool
+    ) -> tuple[Float64Array, Float64Array | None]:
+        '''
+        eigenvalues and eigenvectors (if not eigvals_only) of banded matrix for given J:
+        tridiagonal solver for fd3, otherwise banded eigenvalues & inverse iteration for eigenvectors,
+        if aux (ngrid x ncol) is given, eigenvectors from inverse iteration are reduced
+        to moments (nlev x ncol) of aux columns,
+        select 'vi': levels below select_range[1] from index select_range[0],
+        eigenvectors below the index window are not calculated
+        static to be picklable for process pool
+        '''
+        # diagonal elements (ngrid)
+        diagonal = diag_0 + j * (j + 1) * r_inv2
+
+        vskip = 0
+        if select == 'vi':
+            vskip = select_range[0]
+            select, select_range = 'v', (0., select_range[1])
+
+        if off_bands.shape[0] == 1 and not eigvals_only:
+            if vskip > 0:
+                # index window from number of levels below the limit, at least one level
+                nlev = eigh_tridiagonal(
+                    diagonal,
+                    off_bands[0, :-1],
+                    eigvals_only=True,
+                    select=select,
+                    select_range=select_range
+                ).size
+                select, select_range = 'i', (vskip, max(nlev - 1, vskip))
+            # SciPy routine to calculate eigenvalues and eigenvectors
+            results:tuple[Float64Array, Float64Array] = eigh_tridiagonal(
+                diagonal,
+                off_bands[0, :-1],
+                select=select,
+                select_range=select_range
+            )
+            return results
+
+        a_band = np.vstack([diagonal, off_bands])
+        if off_bands.shape[0] > 1:
+            # eigenpairs refined from fd3 eigenvalues, full banded solution ~ ngrid^2 if refinement failed
+            seeded = Levels._solve_seeded(a_band, select, select_range, vskip)
+            if seeded is not None:
+                eigvals, wfs = seeded
+                if aux is not None:
+                    return eigvals, (wfs**2).T @ aux
+                if eigvals_only:
+                    return eigvals, None
+                return eigvals, wfs
+            eigvals:Float64Array = eigvals_banded(
+                a_band,
+                lower=True,
+                select=select,
+                select_range=select_range
+            )
+        else:
+            eigvals = eigh_tridiagonal(
+                diagonal,
+                off_bands[0, :-1],
+                eigvals_only=True,
+                select=select,
+                select_range=select_range
+            )
+        eigvals = eigvals[vskip:]
+
+        if aux is not None:
+            return eigvals, Levels._inverse_iteration(a_band, eigvals, aux)
+        if eigvals_only:
+            return eigvals, None
+        return eigvals, Levels._inverse_iteration(a_band, eigvals)
+
+    @staticmethod
+    def _solve_seeded(
+        a_band:Float64Array,
+        select:str,
+        select_range:tuple[Any, Any],
+        vskip:int
+    ) -> tuple[Float64Array, Float64Array] | None:
+        '''
+        eigenpairs (nlev, ngrid x nlev) of fd5 / fd7 banded matrix (lower form) for select as in _solve_j
+        by Rayleigh quotient iteration from eigenvalues of fd3 matrix with the same potential (bisection),
+        for energy window the next fd3 level above the limit is refined too to catch levels moved below it,
+        None if refinement failed or levels may be missing
+        '''
+        nband = a_band.shape[0] - 1
+        n_grid = a_band.shape[1]
+
+        # fd3 tridiagonal matrix: kinetic stencil replaced, 1 / step^2 from the first off-diagonal
+        stencil = next(coefs for coefs in Grid.STENCILS.values() if len(coefs) == nband + 1)
+        stencil_fd3 = Grid.STENCILS['fd3']
+        step_inv2 = a_band[1, 0] / stencil[1]
+        diag_fd3 = a_band[0] + (stencil_fd3[0] - stencil[0]) * step_inv2
+        off_fd3 = np.full(n_grid - 1, stencil_fd3[1] * step_inv2)
+
+        if select == 'i':
+            v_0, v_1 = select_range
+        else:
+            v_0 = vskip
+            nlev = eigh_tridiagonal(diag_fd3, off_fd3, eigvals_only=True, select='v', select_range=select_range).size
+            v_1 = min(nlev, n_grid - 1)
+            if v_0 > v_1:
+                return None
+
+        seeds = eigh_tridiagonal(diag_fd3, off_fd3, eigvals_only=True, select='i', select_range=(v_0, v_1))
+        refined = Levels._rayleigh_iteration(a_band, seeds, v_0)
+        if refined is None or select == 'i':
+            return refined
+
+        eigvals, wfs = refined
+        nkeep = int(np.count_nonzero(eigvals <= select_range[1]))
+        if eigvals[0] <= select_range[0] or (nkeep == eigvals.size and v_1 == nlev):
+            # levels below the window or more than one level moved below the limit
+            return None
+        return eigvals[:nkeep], wfs[:, :nkeep]
+
+    @staticmethod
+    def _warm_eigvals(
+        warm:'Levels',
+        j:int,
+        select:str,
+        select_range:tuple[Any, Any]
+    ) -> Float64Array | None:
+        '''
+        previous eigenvalues for index window of J, None if any of them is missing
+        '''
+        eig_j = warm._eigvals.get(j, {})
+        if select != 'i' or not all(v in eig_j for v in range(select_range[0], select_range[1] + 1)):
+            return None
+        return np.array([eig_j[v] for v in range(select_range[0], select_range[1] + 1)])
+
+    @staticmethod
+    def _refine_j(
+        diag_0:Float64Array,
+        r_inv2:Float64Array,
+        off_bands:Float64Array,
+        aux:Float64Array | None,
+        j:int,
+        select:str,
+        select_range:tuple[Any, Any],
+        eigvals_only:bool,
+        eig_prev:Float64Array | None
+    ) -> tuple[Float64Array, Float64Array | None]:
+        '''
+        eigenpairs of banded matrix for given J refined from previous eigenvalues (slightly changed PEC)
+        by Rayleigh quotient iteration, results as in _solve_j, v labels are checked by node count,
+        falls back to _solve_j if previous eigenvalues are missing or refinement failed
+        static to be picklable for process pool
+        '''
+        if eig_prev is not None:
+            a_band = np.vstack([diag_0 + j * (j + 1) * r_inv2, off_bands])
+            refined = Levels._rayleigh_iteration(a_band, eig_prev, select_range[0])
+            if refined is not None:
+                eigvals, wfs = refined
+                if aux is not None:
+                    return eigvals, (wfs**2).T @ aux
+                if eigvals_only:
+                    return eigvals, None
+                return eigvals, wfs
+
+        return Levels._solve_j(diag_0, r_inv2, off_bands, aux, j, select, select_range, eigvals_only)
+
+    @staticmethod
+    def _rayleigh_iteration(
+        a_band:Float64Array,
+        eig_prev:Float64Array,
+        v_0:int
+    ) -> tuple[Float64Array, Float64Array] | None:
+        '''
+        eigenpairs (nlev, ngrid x nlev) of symmetric banded matrix (lower form) near eig_prev
+        for v = v_0, v_0 + 1, ... by Rayleigh quotient iteration,
+        None if not converged, number of nodes is not v or eigenvalues are not ordered
+        '''
+        nband = a_band.shape[0] - 1
+        n_grid = a_band.shape[1]
+        ab = Levels._full_band(a_band)
+        tol = Levels.RQI_TOL * (np.abs(a_band[0]).max() + 2 * np.abs(a_band[1:]).sum(axis=0).max())
+
+        eigvals = np.empty(eig_prev.size)
+        wfs = np.empty((n_grid, eig_prev.size))
+        for n, eigval in enumerate(eig_prev):
+            wf = np.ones(n_grid)
+            for _ in range(Levels.NRQI):
+                # shift slightly off eigenvalue to keep LU non-singular
+                ab[nband] = a_band[0] - eigval * (1 + Levels.SHIFT_REL)
+                wf = solve_banded((nband, nband), ab, wf, check_finite=False)
+                wf /= np.linalg.norm(wf)
+                eigval_new = wf @ Levels._band_matvec(a_band, wf)
+                converged = abs(eigval_new - eigval) <= tol
+                eigval = eigval_new
+                if converged:
+                    break
+            else:
+                return None
+
+            # nodes of WF significant part
+            sig = wf[np.abs(wf) > Levels.SHIFT_REL**0.5 * np.abs(wf).max()]
+            if np.count_nonzero(sig[1:] * sig[:-1] < 0) != v_0 + n:
+                return None
+
+            eigvals[n] = eigval
+            wfs[:, n] = wf * np.sign(wf[np.abs(wf).argmax()])
+
+        if np.any(np.diff(eigvals) <= 0):
+            return None
+
+        return eigvals, wfs
+
+    @staticmethod
+    def _band_matvec(
+        a_band:Float64Array,
+        vec:Float64Array
+    ) -> Float64Array:
+        '''
+        product of symmetric banded matrix (lower form) & vector
+        '''
+        n_grid = a_band.shape[1]
+        prod = a_band[0] * vec
+        for k in range(1, a_band.shape[0]):
+            prod[k:] += a_band[k, :n_grid - k] * vec[:n_grid - k]
+            prod[:n_grid - k] += a_band[k, :n_grid - k] * vec[k:]
+        return prod
+
+    @staticmethod
+    def _solve_j_dvr(
+        pot:Float64Array,
+        r_inv2:Float64Array,
+        kin:Float64Array,
+        j:int,
+        select:str,
+        select_range:tuple[Any, Any],
+        eigvals_only:bool
+    ) -> tuple[Float64Array, Float64Array | None]:
+        '''
+        eigenvalues and DVR coefficients (if not eigvals_only) of dense DVR matrix for given J,
+        sign of coefficients: positive at max |psi|, select 'vi' as in _solve_j
+        static to be picklable for process pool
+        '''
+        matrix = kin + np.diag(pot + j * (j + 1) * r_inv2)
+        if select == 'vi':
+            # index window from number of levels below the limit, at least one level
+            nlev = eigh(matrix, eigvals_only=True, subset_by_value=(0., select_range[1])).size
+            subset = {'subset_by_index': (select_range[0], max(nlev - 1, select_range[0]))}
+        elif select == 'i':
+            subset = {'subset_by_index': select_range}
+        else:
+            subset = {'subset_by_value': select_range}
+
+        if eigvals_only:
+            eigvals:Float64Array = eigh(matrix, eigvals_only=True, **subset)
+            return eigvals, None
+
+        eigvals, coefs = eigh(matrix, **subset)
+        coefs *= np.sign(coefs[np.abs(coefs).argmax(axis=0), np.arange(eigvals.size)])
+
+        return eigvals, coefs
+
+    @staticmethod
+    def _inverse_iteration(
+        a_band:Float64Array,
+        eigvals:Float64Array,
+        aux:Float64Array | None = None
+    ) -> Float64Array:
+        '''
+        eigenvectors (ngrid x nlev) of symmetric banded matrix (lower form) for given eigenvalues,
+        memory ~ ngrid * nband in contrast to eig_banded, sign: positive at max |psi|,
+        if aux (ngrid x ncol) is given, moments (nlev x ncol) of aux columns instead of eigenvectors
+        '''
+        nband = a_band.shape[0] - 1
+        n_grid = a_band.shape[1]
+        ab = Levels._full_band(a_band)
+
+        if aux is None:
+            wfs = np.empty((n_grid, eigvals.size))
+        else:
+            moments = np.empty((eigvals.size, aux.shape[1]))
+        for n, eigval in enumerate(eigvals):
+            # shift slightly off eigenvalue to keep LU non-singular
+            ab[nband] = a_band[0] - eigval * (1 + Levels.SHIFT_REL)
+            wf = np.ones(n_grid)
+            for _ in range(Levels.NITER):
+                wf = solve_banded((nband, nband), ab, wf, check_finite=False)
+                wf /= np.linalg.norm(wf)
+            if aux is None:
+                wfs[:, n] = wf * np.sign(wf[np.abs(wf).argmax()])
+            else:
+                moments[n] = wf**2 @ aux
+
+        return wfs if aux is None else moments
+
+    @staticmethod
+    def _full_band(
+        a_band:Float64Array
+    ) -> Float64Array:
+        '''
+        full band storage for solve_banded from lower form of symmetric banded matrix
+        '''
+        nband = a_band.shape[0] - 1
+        n_grid = a_band.shape[1]
+
+        ab = np.zeros((2 * nband + 1, n_grid))
+        ab[nband] = a_band[0]
+        for k in range(1, nband + 1):
+            ab[nband + k, :n_grid - k] = a_band[k, :n_grid - k]
+            ab[nband - k, k:] = a_band[k, :n_grid - k]
+
+        return ab
 
     def print(
         self,
@@ -127,11 +1156,28 @@ class Levels:
         '''
         print vib-rot levels from dict in custom format
         '''
+        self.print_grid(out)
         out.print('\n=== Energy levels ===')
         for j, en_jv in self.energy.items():
-            out.print(f'\nJ = {j}\n{"v":>3}{"E,cm-1":>15}{"Bv,cm-1":>15}')
-            for v, en_v in en_jv.items():
-                out.print(f'{v:3d}{en_v:15.3f}{self.rot_const[j][v]:15.5f}')
+            if self.energy_err:
+                out.print(f'\nJ = {j}\n{"v":>3}{"E,cm-1":>15}{"Bv,cm-1":>15}{"dE,cm-1":>15}{"dBv,cm-1":>15}')
+                for v, en_v in en_jv.items():
+                    out.print(
+                        f'{v:3d}{en_v:15.6f}{self.rot_const[j][v]:15.8f}' +
+                        f'{self.energy_err[j][v]:15.2e}{self.rot_const_err[j][v]:15.2e}'
+                    )
+            else:
+                out.print(f'\nJ = {j}\n{"v":>3}{"E,cm-1":>15}{"Bv,cm-1":>15}')
+                for v, en_v in en_jv.items():
+                    out.print(f'{v:3d}{en_v:15.3f}{self.rot_const[j][v]:15.5f}')
+
+        if self.cd_const:
+            out.print('\n=== Centrifugal distortion constants, cm-1 ===')
+            out.print('E(v,J) = sum K_n [J(J+1)]^n: K_0 = Gv, K_1 = Bv, K_2 = -Dv, K_3 = Hv, K_4 = Lv, ...\n')
+            ncd = len(next(iter(self.cd_const.values())))
+            out.print(f'{"v":>3}' + ''.join(f'{f"K_{n}":>20}' for n in range(ncd)))
+            for v, kn in self.cd_const.items():
+                out.print(f'{v:3d}' + ''.join(f'{k:20.12e}' for k in kn))
 
     def print_with_expdata(
         self,
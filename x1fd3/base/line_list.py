@@ -0,0 +1,219 @@
+from typing import ClassVar, Any, Iterable, Iterator, TextIO
+from heapq import merge
+from os.path import join
+from tempfile import TemporaryDirectory
+import numpy as np
+import numpy.typing as npt
+
+from .parameters import Parameters
+from .partition_function import PartitionFunction
+
+class LineList:
+    '''
+    class for line list with intensities & Einstein coefficients,
+    lines are streamed to file chunk by chunk,
+    populations & intensities are given for each temperature
+    '''
+    # Scale factor for A, \frac{8 \pi^2}{3 \hbar \epsilon_0} [1 / s / D^2 / (cm-1)^3]
+    SCALE_A:ClassVar[float] = 3.137e-7
+    # max number of lines kept in memory for sorting
+    CHUNK:ClassVar[int] = 100000
+    # branch labels for J' - J''
+    BRANCH_LBL:ClassVar[dict[int, str]] = {
+        -2: 'O',
+        -1: 'P',
+         0: 'Q',
+         1: 'R',
+         2: 'S'
+    }
+
+    # T-independent fields of output, same order as in file, followed by pop & int for each T
+    ROW_FIELDS:ClassVar[list[tuple[str, Any]]] = [
+        ('v2', int),
+        ('j2', int),
+        ('v1', int),
+        ('j1', int),
+        ('branch', 'U1'),
+        ('freq', float),
+        ('me', float),
+        ('sa', float),
+        ('se', float),
+        ('en1', float),
+        ('a', float)
+    ]
+
+    HDRS:ClassVar[list[str]] = ["v'", "J'", "v''", "J''", "Branch", "freq", "me", "Sa", "Se", "E''", "A"]
+    WDS:ClassVar[list[int]]  = [ 4,    4,    4,     4,     7,        15,     15,   10,   10,   15,    15]
+    FTS:ClassVar[list[str]]  = ['d',  'd',  'd',   'd',   '',       '.6f',  '.5e','.5f','.5f','.6f', '.5e']
+
+    def __init__(
+        self,
+        params:Parameters,
+        pfunc:PartitionFunction
+    ) -> None:
+        '''
+        init = set output options, thresholds & Q(T) for temperatures params['temp']
+        '''
+        self.lformat:str = params['lformat']
+        self.lsort:str = params['lsort']
+        self.intmin:float = params['intmin']
+        self.amin:float = params['amin']
+
+        # temperatures, Boltzmann factors 1/kT & Q(T)
+        self.temps:npt.NDArray[np.float64] = np.asarray(params['temp'], dtype=float)
+        self.beta:npt.NDArray[np.float64] = 1 / (pfunc.K_B * self.temps)
+        self.qfunc:npt.NDArray[np.float64] = pfunc.calc(self.temps)
+        self.en0:float = pfunc.en0
+
+        # fields of output with pop & int for each T
+        ntemp = len(self.temps)
+        self.row_dtype = np.dtype(
+            self.ROW_FIELDS + [('pop', float, (ntemp,)), ('int', float, (ntemp,))]
+        )
+        lbls = [f'{temp:g}K' for temp in self.temps]
+        self.hdrs = self.HDRS + [f'pop({lbl})' for lbl in lbls] + [f'int({lbl})' for lbl in lbls]
+        self.wds = self.WDS + [15] * 2 * ntemp
+        self.fts = self.FTS + ['.5e'] * 2 * ntemp
+
+    def calc(
+        self,
+        lines:npt.NDArray[Any]
+    ) -> npt.NDArray[Any]:
+        '''
+        calculate Hoenl-London factors, populations, intensities & Einstein coefficients
+        for lines from MatrixElements, only P and R branches have non-zero factors,
+        pop = (2J''+1) exp(-(E''-E0)/kT) / Q(T) for all T at once
+        '''
+        rows = np.zeros(len(lines), dtype=self.row_dtype)
+        for field in ('v2', 'j2', 'v1', 'j1', 'freq', 'me', 'en1'):
+            rows[field] = lines[field]
+
+        j1 = lines['j1']
+        j2 = lines['j2']
+        dj = j2 - j1
+
+        rows['branch'] = [self.BRANCH_LBL.get(d, 'X') for d in dj.tolist()]
+
+        # Hoenl-London factors for absorption & emission
+        rows['sa'] = np.select([dj == 1, dj == -1], [(j1 + 1) / (2 * j1 + 1), j1 / (2 * j1 + 1)], 0.)
+        rows['se'] = np.select([dj == 1, dj == -1], [j2 / (2 * j2 + 1), (j2 + 1) / (2 * j2 + 1)], 0.)
+
+        # (nline x ntemp)
+        rows['pop'] = (2 * j1 + 1)[:, np.newaxis] * np.exp(
+            - np.outer(lines['en1'] - self.en0, self.beta)
+        ) / self.qfunc
+        rows['int'] = rows['pop'] * (lines['me']**2 * rows['sa'])[:, np.newaxis]
+        rows['a'] = self.SCALE_A * lines['me']**2 * rows['se'] * lines['freq']**3
+
+        return rows
+
+    def write(
+        self,
+        chunks:Iterable[npt.NDArray[Any]],
+        fname:str
+    ) -> int:
+        '''
+        write line list to file, lines below thresholds are skipped,
+        sort by wavenumber if requested: sorted chunks are spilled to disk and merged
+        return number of lines written
+        '''
+        nline = 0
+        with open(fname, 'w', encoding='utf-8') as out:
+            self._write_header(out)
+            if self.lsort == 'freq':
+                with TemporaryDirectory() as tmpdir:
+                    for row in self._merge_sorted(self._rows(chunks), tmpdir):
+                        out.write(self._format(row))
+                        nline += 1
+            else:
+                for rows in self._rows(chunks):
+                    out.writelines(self._format(row) for row in rows.tolist())
+                    nline += len(rows)
+
+        return nline
+
+    def _rows(
+        self,
+        chunks:Iterable[npt.NDArray[Any]]
+    ) -> Iterator[npt.NDArray[Any]]:
+        '''
+        calculate & filter rows chunk by chunk, intmin is applied to max int over T
+        '''
+        for lines in chunks:
+            rows = self.calc(lines)
+            yield rows[(rows['int'].max(axis=1) >= self.intmin) & (rows['a'] >= self.amin)]
+
+    def _merge_sorted(
+        self,
+        rows_iter:Iterator[npt.NDArray[Any]],
+        tmpdir:str
+    ) -> Iterator[tuple[Any, ...]]:
+        '''
+        external merge sort by wavenumber with at most CHUNK lines per run in memory
+        '''
+        runs:list[str] = []
+        buf:list[npt.NDArray[Any]] = []
+        nbuf = 0
+
+        for rows in rows_iter:
+            buf.append(rows)
+            nbuf += len(rows)
+            if nbuf >= self.CHUNK:
+                runs.append(self._spill(buf, tmpdir, len(runs)))
+                buf = []
+                nbuf = 0
+        if nbuf > 0:
+            runs.append(self._spill(buf, tmpdir, len(runs)))
+
+        ifreq = self.row_dtype.names.index('freq')
+        yield from merge(*(self._read_run(run) for run in runs), key=lambda row: row[ifreq])
+
+    def _spill(
+        self,
+        buf:list[npt.NDArray[Any]],
+        tmpdir:str,
+        nrun:int
+    ) -> str:
+        '''
+        sort buffered rows by wavenumber and save to temp file
+        '''
+        rows = np.concatenate(buf)
+        fname = join(tmpdir, f'run_{nrun}.npy')
+        np.save(fname, rows[np.argsort(rows['freq'], kind='stable')])
+        return fname
+
+    def _read_run(
+        self,
+        fname:str
+    ) -> Iterator[tuple[Any, ...]]:
+        '''
+        read sorted run from temp file block by block
+        '''
+        run = np.load(fname, mmap_mode='r')
+        nblock = max(1, self.CHUNK // 10)
+        for start in range(0, len(run), nblock):
+            yield from run[start:start + nblock].tolist()
+
+    def _write_header(
+        self,
+        out:TextIO
+    ) -> None:
+        '''
+        print header in chosen format
+        '''
+        if self.lformat == 'csv':
+            out.write(','.join(self.hdrs) + '\n')
+        else:
+            out.write(''.join(f'{hdr:>{wd}}' for hdr, wd in zip(self.hdrs, self.wds)) + '\n')
+
+    def _format(
+        self,
+        row:tuple[Any, ...]
+    ) -> str:
+        '''
+        format row in chosen format, pop & int arrays are flattened
+        '''
+        vals = [*row[:-2], *row[-2], *row[-1]]
+        if self.lformat == 'csv':
+            return ','.join(f'{val:{ft}}' for val, ft in zip(vals, self.fts)) + '\n'
+        return ''.join(f'{val:>{wd}{ft}}' for val, wd, ft in zip(vals, self.wds, self.fts)) + '\n'
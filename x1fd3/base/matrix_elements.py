@@ -1,5 +1,7 @@
-from typing import ClassVar
+from typing import ClassVar, Any, Iterable, Iterator
+from functools import cached_property
 import numpy as np
+import numpy.typing as npt
 
 from .p_w_curve import PWCurve
 from .levels import Levels
@@ -10,12 +12,26 @@ class MatrixElements:
     '''
     class for matrix elements
     '''
-    # Scale factor for A, \frac{8 \pi^2}{3 \hbar \epsilon_0} [1 / s / D^2 / (cm-1)^3]
-    SCALE_A:ClassVar[float] = 3.137e-7
-    # Boltzmann constant  [cm-1 / K]
-    K_B:ClassVar[float] = 0.695
-    # Temperature [K]
-    T:ClassVar[float] = 298.0
+    # J' - J'' for branches
+    BRANCH_DJ:ClassVar[dict[str, int]] = {
+        'R': 1,
+        'Q': 0,
+        'P': -1
+    }
+
+    # fields of line list
+    LINE_DTYPE:ClassVar[np.dtype] = np.dtype([
+        ('v2', int),
+        ('j2', int),
+        ('v1', int),
+        ('j1', int),
+        ('freq', float),
+        ('en1', float),
+        ('me', float)
+    ])
+
+    # memory budget [bytes] for WF windows cached per J & for stacked WFs of branches all
+    MEM_WINDOWS:ClassVar[int] = 2**28
 
     def __init__(
         self,
@@ -25,98 +41,273 @@ class MatrixElements:
     ) -> None:
         '''
         init = calculate matrix elements of given dipole function
+        for single band v1 -> v2 or for all bands up to vmax
+        only for (J', J'') pairs allowed by params['branches']: combination of P, Q, R or all
         '''
-        self.v1:int = params['v1']
-        self.v2:int = params['v2']
-
-        self.energy1:dict[int, dict[int, float]] = {}
-        self.freq:dict[int, dict[int, float]] = {}
-        self.matrix_elements:dict[int, dict[int, np.float64]] = {}
+        self.bands:list[tuple[int, int]] = self.get_bands(params)
+        self.branches:str = params['branches']
 
         # cubic spline to find DM values
-        d_grid = dm.spline(levels.r_grid)
-
-        # matrix elements calc
-        for j2 in levels.energy.keys():
-            self.energy1[j2] = {}
-            self.freq[j2] = {}
-            self.matrix_elements[j2] = {}
-            for j1 in levels.energy.keys():
-                self.energy1[j2][j1] = levels.energy[j1][self.v1]
-                self.freq[j2][j1] = levels.energy[j2][self.v2] - levels.energy[j1][self.v1]
-                self.matrix_elements[j2][j1] = np.sum(
-                    levels.wavef_grid[j1][self.v1] *
-                    levels.wavef_grid[j2][self.v2] *
-                    d_grid
-                )
+        self._d_grid = dm.spline(levels.r_grid)
 
-    def print(
+        # v & J required
+        vlist = self.get_vlist(params)
+        self._vpos = {v: n for n, v in enumerate(vlist)}
+        self._nj = max(levels.energy.keys()) + 1
+
+        # stored WFs are integrated J pair by J pair, no dense copies of all WFs
+        self._wavef_grid = levels.wavef_grid
+        self._wavef_offset = levels.wavef_offset
+        # dense WF window of each J built once & cached within MEM_WINDOWS
+        self._windows:dict[int, tuple[int, npt.NDArray[np.float64]]] = {}
+        self._windows_mem = 0
+
+        # energies (nJ x nv), NaN for missing levels
+        self._en = np.full((self._nj, len(vlist)), np.nan)
+        for j, en_jv in levels.energy.items():
+            for v, en_v in en_jv.items():
+                if v in self._vpos:
+                    self._en[j, self._vpos[v]] = en_v
+
+        for v, pos in self._vpos.items():
+            if np.all(np.isnan(self._en[:, pos])):
+                raise RuntimeError(f'no levels with v = {v} of requested band(s), check "emax" & "jmaxv"')
+
+    @cached_property
+    def lines(
+        self
+    ) -> npt.NDArray[Any]:
+        '''
+        combined line list ordered by band and J, calculated on first access
+        '''
+        lines = np.concatenate([np.zeros(0, dtype=self.LINE_DTYPE), *self.line_chunks()])
+        return lines[np.lexsort((lines['j1'], lines['j2'], lines['v2'], lines['v1']))]
+
+    @cached_property
+    def energy1(
+        self
+    ) -> dict[int, dict[int, float]]:
+        '''
+        E'' for single band: {J': {J'': E''}}, built from lines on first access
+        '''
+        return self._single_band_dict('en1')
+
+    @cached_property
+    def freq(
+        self
+    ) -> dict[int, dict[int, float]]:
+        '''
+        transition energies for single band: {J': {J'': freq}}, built from lines on first access
+        '''
+        return self._single_band_dict('freq')
+
+    @cached_property
+    def matrix_elements(
+        self
+    ) -> dict[int, dict[int, float]]:
+        '''
+        matrix elements for single band: {J': {J'': <f'|d|f''>}}, built from lines on first access
+        '''
+        return self._single_band_dict('me')
+
+    def _single_band_dict(
         self,
-        out:Logger
-    ) -> None:
+        field:str
+    ) -> dict[int, dict[int, float]]:
         '''
-        print calculated matrix elements in custom format
+        field of line list as dict {J': {J'': value}} for all J' with upper level, empty for several bands
         '''
-        out.print("\n=== Transition energies & Intergals <f(v',J')|d|f(v'',J'')>,D ===\n")
-        out.print(f"v'' = {self.v1}")
-        out.print(f"v'  = {self.v2}\n")
-
-        for j2, me_j2j1 in self.matrix_elements.items():
-            out.print(f"J' = {j2}")
-            out.print(f'''{"J''":>4}{"freq,cm-1":>15}{"E'',cm-1":>15}{"<f'|d|f''>,D":>15}''')
-            for j1, me in me_j2j1.items():
-                en1 = self.energy1[j2][j1]
-                frq = self.freq[j2][j1]
-                out.print(f"{j1:4d}{frq:15.3f}{en1:15.3f}{me:15.5e}")
-            out.print()
+        if len(self.bands) > 1:
+            return {}
+
+        v2 = self.bands[0][1]
+        res:dict[int, dict[int, float]] = {
+            j: {} for j in range(self._nj) if not np.isnan(self._en[j, self._vpos[v2]])
+        }
+        for line in self.lines:
+            res[int(line['j2'])][int(line['j1'])] = float(line[field])
 
-    def _ht(
+        return res
+
+    def line_chunks(
+        self
+    ) -> Iterator[npt.NDArray[Any]]:
+        '''
+        generate line list chunk by chunk (band and J' - J''),
+        matrix elements are batched over all bands for each J pair from stored WFs,
+        for branches all over all J pairs at once by single product of stacked WFs if within MEM_WINDOWS
+        '''
+        nj = self._nj
+        vpos = self._vpos
+
+        # J' - J'' allowed
+        melems_all = None
+        if self.branches == 'all':
+            djs = list(range(nj - 1, - nj, -1))
+            melems_all = self._integrals_all()
+        else:
+            djs = [dj for lbl, dj in self.BRANCH_DJ.items() if lbl in self.branches]
+
+        for dj in djs:
+            sl2 = slice(max(dj, 0), nj + min(dj, 0))
+            sl1 = slice(max(-dj, 0), nj + min(-dj, 0))
+            j2 = np.arange(nj)[sl2]
+            j1 = np.arange(nj)[sl1]
+            # (nJ pairs x nv x nv) integrals
+            if melems_all is not None:
+                melems = melems_all[j2, :, j1, :]
+            else:
+                melems = np.stack([self._integrals(j_2, j_1) for j_2, j_1 in zip(j2.tolist(), j1.tolist())])
+            for v1, v2 in self.bands:
+                en1 = self._en[sl1, vpos[v1]]
+                en2 = self._en[sl2, vpos[v2]]
+                mask = ~np.isnan(en1) & ~np.isnan(en2)
+                chunk = np.zeros(np.count_nonzero(mask), dtype=self.LINE_DTYPE)
+                chunk['v2'] = v2
+                chunk['j2'] = j2[mask]
+                chunk['v1'] = v1
+                chunk['j1'] = j1[mask]
+                chunk['freq'] = en2[mask] - en1[mask]
+                chunk['en1'] = en1[mask]
+                chunk['me'] = melems[mask, vpos[v2], vpos[v1]]
+                yield chunk
+
+    def _integrals(
+        self,
+        j2:int,
+        j1:int
+    ) -> npt.NDArray[np.float64]:
+        '''
+        integrals <f(v',J')|d|f(v'',J'')> (nv x nv) for single J pair
+        over common part of stored WF windows
+        '''
+        off2, wf2 = self._window(j2)
+        off1, wf1 = self._window(j1)
+        start = max(off2, off1)
+        stop = min(off2 + wf2.shape[1], off1 + wf1.shape[1])
+        if stop <= start:
+            return np.zeros((wf2.shape[0], wf1.shape[0]))
+
+        return (wf2[:, start - off2:stop - off2] * self._d_grid[start:stop]) @ wf1[:, start - off1:stop - off1].T
+
+    def _integrals_all(
+        self
+    ) -> npt.NDArray[np.float64] | None:
+        '''
+        integrals (nJ x nv x nJ x nv) for all J pairs by single product of stacked WFs
+        on the grid window covering all stored WFs, None if stacked WFs exceed MEM_WINDOWS
+        '''
+        stored = self._stored_wavef(range(self._nj))
+        nv = len(self._vpos)
+        if not stored:
+            return np.zeros((self._nj, nv, self._nj, nv))
+
+        start = min(offset for _, _, offset, _ in stored)
+        stop = max(offset + wf.size for _, _, offset, wf in stored)
+        if 2 * self._nj * nv * (stop - start) * 8 > self.MEM_WINDOWS:
+            return None
+
+        wfs = np.zeros((self._nj, nv, stop - start))
+        for j, v, offset, wf in stored:
+            wfs[j, self._vpos[v], offset - start:offset - start + wf.size] = wf
+        wfs = wfs.reshape(self._nj * nv, stop - start)
+
+        melems:npt.NDArray[np.float64] = ((wfs * self._d_grid[start:stop]) @ wfs.T).reshape(self._nj, nv, self._nj, nv)
+        return melems
+
+    def _stored_wavef(
+        self,
+        jlist:Iterable[int]
+    ) -> list[tuple[int, int, int, npt.NDArray[Any]]]:
+        '''
+        stored WFs of required v for given J: (J, v, offset, WF)
+        '''
+        return [
+            (j, v, self._wavef_offset[j][v], wf)
+            for j in jlist
+            for v, wf in self._wavef_grid.get(j, {}).items() if v in self._vpos
+        ]
+
+    def _window(
+        self,
+        j:int
+    ) -> tuple[int, npt.NDArray[np.float64]]:
+        '''
+        stored WFs of J as float64 rows (nv x nwindow) on the smallest grid window covering them
+        & offset of the window, zero rows for missing levels,
+        built once for each J & cached while total size is within MEM_WINDOWS
+        '''
+        if j in self._windows:
+            return self._windows[j]
+
+        stored = self._stored_wavef([j])
+        if not stored:
+            return 0, np.zeros((len(self._vpos), 0))
+
+        start = min(offset for _, _, offset, _ in stored)
+        stop = max(offset + wf.size for _, _, offset, wf in stored)
+
+        window = np.zeros((len(self._vpos), stop - start))
+        for _, v, offset, wf in stored:
+            window[self._vpos[v], offset - start:offset - start + wf.size] = wf
+
+        if self._windows_mem + window.nbytes <= self.MEM_WINDOWS:
+            self._windows[j] = (start, window)
+            self._windows_mem += window.nbytes
+
+        return start, window
+
+    @staticmethod
+    def get_bands(
+        params:Parameters
+    ) -> list[tuple[int, int]]:
+        '''
+        list of (v'', v') bands: (v1, v2) or all vmin <= v'' < v' <= vmax
+        '''
+        if 'vmax' in params.keys():
+            return [
+                (v1, v2)
+                for v1 in range(params['vmin'], params['vmax'] + 1)
+                for v2 in range(v1 + 1, params['vmax'] + 1)
+            ]
+        return [(params['v1'], params['v2'])]
+
+    @staticmethod
+    def get_vlist(
+        params:Parameters
+    ) -> list[int]:
+        '''
+        sorted list of v required for bands
+        '''
+        return sorted({v for band in MatrixElements.get_bands(params) for v in band})
+
+    def print(
         self,
         out:Logger
     ) -> None:
         '''
-        ht comp
-        '''
-        jm = max(self.matrix_elements.keys())
-
-        jlist = []
-        for j1 in range(jm, 0, -1):
-            j2 = j1 - 1
-            jlist.append((j2, j1))
-        for j1 in range(jm):
-            j2 = j1 + 1
-            jlist.append((j2, j1))
-
-        hdrs = ["Branch", "J'", "J''", "freq", "me", "Sa", "E''", "pop", "int", "Se", "A"]
-        wds  = [ 6,        4,    4,     15,     15,   10,   15,    15,    15,    10,   15]
-        fts  = ['',       'd',  'd',  '.3f',  '.5e','.5f','.3f', '.5e', '.5e', '.5f','.5e']
-
-        for wd, hdr in zip(wds, hdrs):
-            out.print(f'{hdr:>{wd}}', end='')
-        out.print()
-
-        for j2, j1 in jlist:
-            dj = j2 - j1
-            if dj == 1:
-                lbl = "R"
-                sa = (j1 + 1) / (2 * j1 + 1)
-                se =  j2      / (2 * j2 + 1)
-            elif dj == -1:
-                lbl = "P"
-                sa = j1       / (2 * j1 + 1)
-                se = (j2 + 1) / (2 * j2 + 1)
-            else:
-                raise RuntimeError('wrong dJ')
-
-            en1 = self.energy1[j2][j1]
-            frq  = self.freq[j2][j1]
-            me = self.matrix_elements[j2][j1]
+        print calculated matrix elements in custom format
+        '''
+        out.print("\n=== Transition energies & Intergals <f(v',J')|d|f(v'',J'')>,D ===\n")
 
-            pop = (2 * j1 + 1) * np.exp(-en1 / self.K_B / self.T)
-            a = self.SCALE_A * me**2 * se * frq**3
-            inten = pop * me**2 * sa
+        if len(self.bands) == 1:
+            v1, v2 = self.bands[0]
+            out.print(f"v'' = {v1}")
+            out.print(f"v'  = {v2}\n")
 
-            vals = [lbl, j2, j1, frq, me, sa, en1, pop, inten, se, a]
-            for val, wd, ft in zip(vals, wds, fts):
-                out.print(f'{val:{wd}{ft}}', end='')
+            for j2, me_j2j1 in self.matrix_elements.items():
+                out.print(f"J' = {j2}")
+                out.print(f'''{"J''":>4}{"freq,cm-1":>15}{"E'',cm-1":>15}{"<f'|d|f''>,D":>15}''')
+                for j1, me in me_j2j1.items():
+                    en1 = self.energy1[j2][j1]
+                    frq = self.freq[j2][j1]
+                    out.print(f"{j1:4d}{frq:15.3f}{en1:15.3f}{me:15.5e}")
+                out.print()
+        else:
+            out.print(f'''{"v'":>4}{"J'":>4}{"v''":>4}{"J''":>4}{"freq,cm-1":>15}{"E'',cm-1":>15}{"<f'|d|f''>,D":>15}''')
+            for line in self.lines:
+                out.print(
+                    f"{line['v2']:4d}{line['j2']:4d}{line['v1']:4d}{line['j1']:4d}" +
+                    f"{line['freq']:15.3f}{line['en1']:15.3f}{line['me']:15.5e}"
+                )
             out.print()
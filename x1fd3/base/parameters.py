@@ -11,10 +11,12 @@ class Parameters(UserDict[str, Any]):
     '''
     def read_pec_params(
             self,
-            fname:str
+            fname:str,
+            approx:bool = False
         ) -> None:
         '''
-        read params for PEC from file
+        read params for PEC from file,
+        if approx (PecApprox mode), fit option varpro (yes / no) is accepted as well
         '''
         input_parser = ConfigParser(delimiters=(' ', '\t'))
         input_parser.read(fname)
@@ -37,6 +39,7 @@ class Parameters(UserDict[str, Any]):
 
         tmp['te'] = None
         tmp['td'] = None
+        varpro = None
 
         for keyword, value in input_parser[ptype].items():
             if keyword in ('q', 'p', 's'):
@@ -49,6 +52,9 @@ class Parameters(UserDict[str, Any]):
                 tmp[keyword] = np.array(list(map(int, value.split())), dtype=int)
             elif keyword in ('dampf'):
                 tmp[keyword] = value
+            elif keyword == 'varpro' and approx:
+                # fit option of PecApprox, not a PEC parameter
+                varpro = value
             else:
                 raise RuntimeError(f'Unknown keyword "{keyword}"')
 
@@ -58,8 +64,13 @@ class Parameters(UserDict[str, Any]):
         if tmp.keys() != params_check[ptype]:
             raise RuntimeError(f'For {ptype} the following parameters must be given: {params_check[ptype]}')
 
+        if varpro is not None and varpro not in ('yes', 'no'):
+            raise RuntimeError(f'Unknown varpro "{varpro}", only "yes" or "no" supported')
+
         self.update(tmp)
         self['ptype'] = ptype
+        if varpro is not None:
+            self['varpro'] = varpro == 'yes'
 
     def read_vr_calc_params(
             self,
@@ -69,7 +80,7 @@ class Parameters(UserDict[str, Any]):
         '''
         read params for vib-rot level calculation from file
         '''
-        if not rtype in ['ENERGY', 'SPECTRUM', 'FIT']:
+        if not rtype in ['ENERGY', 'SPECTRUM', 'FIT', 'SCAN']:
             raise RuntimeError(f'Uknown run type "{rtype}"')
 
         # read calc params
@@ -85,19 +96,184 @@ class Parameters(UserDict[str, Any]):
         tmp = {}
 
         for keyword, value in input_parser[rtype].items():
-            if keyword in ('jmax', 'v1', 'v2'):
+            if keyword == 'jmax' and value == 'auto':
+                # all J with bound levels
+                tmp[keyword] = -1
+            elif keyword in ('jmax', 'v1', 'v2', 'vmin', 'vmax', 'nproc', 'richardson', 'ndvr', 'ncd',
+                             'nmin', 'nmax', 'nstart', 'seed'):
                 tmp[keyword] = int(value)
-            elif keyword in ('mass1', 'mass2', 'rmin', 'rmax'):
+            elif keyword in ('mass1', 'mass2', 'rmin', 'rmax', 'intmin', 'amin', 'wftol', 'step', 'trim', 'emax', 'spread'):
                 tmp[keyword] = float(value)                        # type: ignore
+            elif keyword in ('janchor', 'jmaxv'):
+                tmp[keyword] = list(map(int, value.split()))     # type: ignore
+            elif keyword == 'stepfit':
+                tmp[keyword] = list(map(float, value.split()))   # type: ignore
+            elif keyword == 'temp':
+                tmp[keyword] = np.array(list(map(float, value.split())), dtype=float) # type: ignore
+            elif keyword in ('pool', 'branches', 'lfile', 'lformat', 'lsort', 'wfstore', 'engine', 'centrifugal', 'jac',
+                             'varpro'):
+                tmp[keyword] = value                               # type: ignore
 
         params_check = {
             'ENERGY':   {'mass1', 'mass2', 'rmin', 'rmax', 'jmax'},
-            'SPECTRUM': {'mass1', 'mass2', 'rmin', 'rmax', 'jmax', 'v1', 'v2'},
-            'FIT':      {'mass1', 'mass2', 'rmin', 'rmax'}
+            'SPECTRUM': {'mass1', 'mass2', 'rmin', 'rmax', 'jmax'},
+            'FIT':      {'mass1', 'mass2', 'rmin', 'rmax'},
+            'SCAN':     {'nmin', 'nmax'}
+        }
+
+        # bands for spectrum: single v1 -> v2 or all up to vmax, max v for energy
+        params_band = {
+            'ENERGY':   {'vmax'},
+            'SPECTRUM': {'v1', 'v2', 'vmax'},
+            'FIT':      set(),
+            'SCAN':     set()
+        }
+
+        # optional parameters & default values
+        params_default_pool = {
+            'nproc': 1,
+            'pool': 'process'
+        }
+
+        params_default_all = params_default_pool | {
+            'wfstore': 'full',
+            'wftol': 1e-8,
+            'step': 1e-4,
+            'richardson': 0,
+            'engine': 'fd3',
+            'ndvr': 400,
+            'centrifugal': 'exact',
+            'ncd': 6,
+            'janchor': [],
+            'trim': 0.,
+            'vmin': 0,
+            'emax': 0.,
+            'jmaxv': []
+        }
+
+        params_default = {
+            'ENERGY':   params_default_all,
+            'SPECTRUM': params_default_all | {
+                'branches': 'PR',
+                'lfile': '',
+                'lformat': 'fixed',
+                'lsort': 'none',
+                'intmin': 0.,
+                'amin': 0.,
+                'temp': np.array([298.])
+            },
+            'FIT':      params_default_all | {
+                'jac': 'analytic',
+                'stepfit': []
+            },
+            'SCAN':     params_default_pool | {
+                'nstart': 4,
+                'spread': 0.1,
+                'seed': 0,
+                'varpro': 'no'
+            }
         }
 
-        if tmp.keys() != params_check[rtype]:
-            raise RuntimeError(f'for {rtype} the only following parameters must be given: {params_check[rtype]}')
+        params_allowed = params_check[rtype] | params_band[rtype] | params_default[rtype].keys()
+        if not params_check[rtype] <= tmp.keys() <= params_allowed:
+            raise RuntimeError(
+                f'for {rtype} the only following parameters must be given: {params_check[rtype]}, ' +
+                f'optional: {set(params_default[rtype].keys())}'
+            )
+
+        if rtype == 'SPECTRUM' and tmp.keys() & params_band[rtype] not in ({'v1', 'v2'}, {'vmax'}):
+            raise RuntimeError('for SPECTRUM either "v1" & "v2" or "vmax" must be given')
+
+        if rtype == 'SPECTRUM' and 'v1' in tmp and tmp.get('vmin', 0) > min(tmp['v1'], tmp['v2']):
+            raise RuntimeError('"vmin" excludes the band "v1" -> "v2"')
+
+        if rtype == 'FIT' and tmp.keys() & {'vmin', 'emax', 'jmaxv'}:
+            raise RuntimeError('"vmin", "emax" & "jmaxv" are not used for FIT, levels are given by exp. levels')
+
+        for keyword, value in params_default[rtype].items():
+            tmp.setdefault(keyword, value)
+
+        if tmp['nproc'] < 1:
+            raise RuntimeError('"nproc" must be positive')
+
+        if tmp['pool'] not in ('thread', 'process'):
+            raise RuntimeError(f'Unknown pool type "{tmp["pool"]}", only "thread" or "process" supported')
+
+        if tmp.get('jac', 'analytic') not in ('analytic', 'fd'):
+            raise RuntimeError(f'Unknown jacobian "{tmp["jac"]}", only "analytic" or "fd" supported')
+
+        if rtype == 'SCAN':
+            # PEC approximation only, no levels parameters
+            if not (0 <= tmp['nmin'] <= tmp['nmax'] and tmp['nstart'] >= 1 and tmp['spread'] >= 0):
+                raise RuntimeError('for SCAN 0 <= "nmin" <= "nmax", "nstart" >= 1 & "spread" >= 0 are required')
+            if tmp['varpro'] not in ('yes', 'no'):
+                raise RuntimeError(f'Unknown varpro "{tmp["varpro"]}", only "yes" or "no" supported')
+            tmp['varpro'] = tmp['varpro'] == 'yes'
+            self.update(tmp)
+            self['rtype'] = rtype
+            return
+
+        if tmp['step'] <= 0:
+            raise RuntimeError('"step" must be positive')
+
+        if any(step <= tmp['step'] for step in tmp.get('stepfit', [])):
+            raise RuntimeError('"stepfit" must be greater than "step"')
+
+        if tmp['engine'] not in ('fd3', 'fd5', 'fd7', 'dvr'):
+            raise RuntimeError(f'Unknown engine "{tmp["engine"]}", only "fd3", "fd5", "fd7" or "dvr" supported')
+
+        if tmp['centrifugal'] not in ('exact', 'hutson'):
+            raise RuntimeError(f'Unknown centrifugal mode "{tmp["centrifugal"]}", only "exact" or "hutson" supported')
+
+        if tmp['centrifugal'] == 'hutson' and (rtype != 'ENERGY' or tmp['engine'] == 'dvr'):
+            raise RuntimeError('"centrifugal hutson" is supported for ENERGY with fd engines only')
+
+        if tmp['centrifugal'] == 'hutson' and tmp.get('jmax', 0) < 0:
+            raise RuntimeError('"centrifugal hutson" requires explicit "jmax"')
+
+        if tmp['vmin'] < 0 or tmp['emax'] < 0 or any(j < 0 for j in tmp['jmaxv']):
+            raise RuntimeError('"vmin", "emax" & "jmaxv" must be non-negative')
+
+        if tmp.get('vmax', tmp['vmin']) < tmp['vmin']:
+            raise RuntimeError('"vmax" must not be less than "vmin"')
+
+        if not 0 <= tmp['trim'] < 1:
+            raise RuntimeError('"trim" must be in [0, 1)')
+
+        if tmp['ncd'] < 1:
+            raise RuntimeError('"ncd" must be positive')
+
+        if tmp['ndvr'] < 10:
+            raise RuntimeError('"ndvr" must be at least 10')
+
+        if tmp['engine'] == 'dvr' and tmp['richardson']:
+            raise RuntimeError('"richardson" is not supported for "dvr" engine')
+
+        if tmp['richardson'] not in (0, 2, 3):
+            raise RuntimeError('"richardson" must be 0 (off), 2 or 3 (number of grids)')
+
+        if tmp['wfstore'] not in ('full', 'float32', 'support', 'mmap', 'none'):
+            raise RuntimeError(
+                f'Unknown WF storage "{tmp["wfstore"]}", only "full", "float32", "support", "mmap" or "none" supported'
+            )
+
+        if rtype != 'ENERGY' and tmp['wfstore'] == 'none':
+            raise RuntimeError(f'WFs are required for {rtype}, "wfstore none" is allowed for ENERGY only')
+
+        if not 0 <= tmp['wftol'] < 1:
+            raise RuntimeError('"wftol" must be in [0, 1)')
+
+        if rtype == 'SPECTRUM' and tmp['branches'] != 'all' and not set(tmp['branches']) <= set('PQR'):
+            raise RuntimeError(f'Unknown branches "{tmp["branches"]}", only "all" or combination of "P", "Q", "R" supported')
+
+        if rtype == 'SPECTRUM' and tmp['lformat'] not in ('fixed', 'csv'):
+            raise RuntimeError(f'Unknown line list format "{tmp["lformat"]}", only "fixed" or "csv" supported')
+
+        if rtype == 'SPECTRUM' and tmp['lsort'] not in ('none', 'freq'):
+            raise RuntimeError(f'Unknown line list sorting "{tmp["lsort"]}", only "none" or "freq" supported')
+
+        if rtype == 'SPECTRUM' and (tmp['temp'].size == 0 or np.any(tmp['temp'] <= 0)):
+            raise RuntimeError('"temp" must be list of positive temperatures')
 
         self.update(tmp)
         self['rtype'] = rtype
@@ -0,0 +1,76 @@
+from typing import ClassVar
+import numpy as np
+import numpy.typing as npt
+
+from .p_w_curve import PWCurve
+from .parameters import Parameters
+from .exp_data import ExpData
+from .levels import Levels
+from .logger import Logger
+
+Float64Array = npt.NDArray[np.float64]
+
+class PartitionFunction:
+    '''
+    class for partition function Q(T) from all bound vib-rot levels
+    '''
+    # Boltzmann constant  [cm-1 / K]
+    K_B:ClassVar[float] = 0.6950348
+
+    def __init__(
+        self,
+        params:Parameters,
+        pec:PWCurve
+    ) -> None:
+        '''
+        init = calculate energies of all bound levels (jmax auto),
+        with fd3 correction as for levels of line list (same zero of energy), WF are not needed for Q(T)
+        '''
+        tmp = Parameters()
+        tmp.update(params)
+        tmp['jmax'] = -1
+        tmp['centrifugal'] = 'exact'
+        # no selection of levels
+        tmp.update({'vmin': 0, 'vmax': -1, 'emax': 0., 'jmaxv': []})
+
+        # all bound levels
+        levels = Levels(tmp, pec, ExpData(), energies_only=True)
+
+        energy:list[float] = []
+        degen:list[int] = []
+        for j, en_jv in levels.energy.items():
+            energy.extend(en_jv.values())
+            degen.extend([2 * j + 1] * len(en_jv))
+        self.jmax:int = max(levels.energy.keys(), default=-1)
+
+        if not energy:
+            raise RuntimeError('no bound levels found for partition function')
+
+        self.energy:Float64Array = np.array(energy)
+        self.degen:Float64Array = np.array(degen, dtype=float)
+        # zero of energy = lowest level
+        self.en0:float = float(self.energy.min())
+
+    def calc(
+        self,
+        temps:Float64Array
+    ) -> Float64Array:
+        '''
+        Q(T) relative to lowest level for array of temperatures
+        '''
+        boltz = np.exp(- np.outer(self.energy - self.en0, 1 / (self.K_B * np.asarray(temps))))
+        qfunc:Float64Array = self.degen @ boltz
+        return qfunc
+
+    def print(
+        self,
+        temps:Float64Array,
+        out:Logger
+    ) -> None:
+        '''
+        print Q(T) in custom format
+        '''
+        out.print(f'\n=== Partition function: {self.energy.size} bound levels, J <= {self.jmax} ===\n')
+        out.print(f'{"T,K":>10}{"Q(T)":>15}')
+        for temp, qfunc in zip(temps, self.calc(temps)):
+            out.print(f'{temp:10.2f}{qfunc:15.6e}')
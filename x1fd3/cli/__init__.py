@@ -5,6 +5,7 @@ from .driver_levels_an import DriverLevelsAn
 from .driver_spectrum_p_w import DriverSpectrumPW
 from .driver_spectrum_an import DriverSpectrumAn
 from .driver_fit_exp import DriverFitExp
+from .driver_pec_scan import DriverPecScan
 
 __all__ = (
     'Driver',
@@ -13,5 +14,6 @@ __all__ = (
     'DriverLevelsAn',
     'DriverSpectrumPW',
     'DriverSpectrumAn',
-    'DriverFitExp'
+    'DriverFitExp',
+    'DriverPecScan'
 )
@@ -64,6 +64,13 @@ class Driver(ABC):
                 '       <2> = file with pre-fitted parameters     | example: input/fitted_emo.txt\n' +
                 '       <3> = file with point-wise pec            | example: input/pw_pec.txt\n' +
                 '       <4> = file with exp. vib.-rot. levels     | example: input/exp_levels.txt'
+            ),
+            'PecScan': (
+                3,
+                'Usage: python -m x1fd3 PecScan <1> <2> <3>\n' +
+                '       <1> = file with parameters for scan | example: input/params_scan.txt\n' +
+                '       <2> = file with initial parameters  | example: input/init_emo.txt\n' +
+                '       <3> = file with point-wise pec      | example: input/pw_pec.txt'
             )
         }
 
@@ -111,6 +118,11 @@ class Driver(ABC):
                 'Fitted PEC parameters',
                 'Point-wise PEC',
                 'Experimental levels'
+            ),
+            'PecScan': (
+                'Parameters for scan',
+                'Init PEC parameters',
+                'Point-wise PEC'
             )
         }
 
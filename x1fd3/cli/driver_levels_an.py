@@ -17,4 +17,5 @@ class DriverLevelsAn(Driver):
         self
     ) -> None:
         # calc and print vr levels
-        Levels(self.params, PWCurve(), ExpData()).print(self.out)
+        with Levels(self.params, PWCurve(), ExpData()) as levels:
+            levels.print(self.out)
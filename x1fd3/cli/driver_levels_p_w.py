@@ -17,4 +17,5 @@ class DriverLevelsPW(Driver):
         self
     ) -> None:
         # calc and print vr levels
-        Levels(self.params, self.pec, ExpData()).print(self.out)
+        with Levels(self.params, self.pec, ExpData()) as levels:
+            levels.print(self.out)
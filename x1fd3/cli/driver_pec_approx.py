@@ -10,7 +10,7 @@ class DriverPecApprox(Driver):
     def read_files(
         self
     ) -> None:
-        self.params.read_pec_params(self.input_files[0])
+        self.params.read_pec_params(self.input_files[0], approx=True)
         self.pec = PWCurve(self.input_files[1])
 
     def core(
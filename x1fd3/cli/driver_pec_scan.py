@@ -0,0 +1,23 @@
+from x1fd3.base import PWCurve, \
+                       FitScan, \
+                       ExpData
+from .driver import Driver
+
+class DriverPecScan(Driver):
+    '''
+    Driver for PecScan mode
+    '''
+    def read_files(
+        self
+    ) -> None:
+        self.params.read_vr_calc_params(self.input_files[0], 'SCAN')
+        self.params.read_pec_params(self.input_files[1])
+        self.pec = PWCurve(self.input_files[2])
+
+    def core(
+        self
+    ) -> None:
+        self.out.print('=== Multi-start point-wise PEC approximation over beta orders ===\n')
+        # fits and print
+        scan = FitScan(self.params, self.pec, ExpData())
+        scan.print(self.out)
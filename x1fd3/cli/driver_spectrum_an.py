@@ -1,7 +1,9 @@
 from x1fd3.base import PWCurve, \
                        Levels, \
                        ExpData, \
-                       MatrixElements
+                       MatrixElements, \
+                       LineList, \
+                       PartitionFunction
 from .driver import Driver
 
 class DriverSpectrumAn(Driver):
@@ -18,7 +20,17 @@ class DriverSpectrumAn(Driver):
     def core(
         self
     ) -> None:
-        # calc vr levels
-        levels = Levels(self.params, PWCurve(), ExpData())
-        # calc and print integrals
-        MatrixElements(self.params, levels, self.dm).print(self.out)
+        # calc vr levels, only v required for bands, temporary WF files are removed on exit
+        with Levels(self.params, PWCurve(), ExpData(), MatrixElements.get_vlist(self.params)) as levels:
+            levels.print_grid(self.out)
+            # calc integrals
+            melems = MatrixElements(self.params, levels, self.dm)
+            # print integrals or write line list to separate file
+            if self.params['lfile']:
+                # Q(T) from all bound levels
+                pfunc = PartitionFunction(self.params, PWCurve())
+                pfunc.print(self.params['temp'], self.out)
+                nline = LineList(self.params, pfunc).write(melems.line_chunks(), self.params['lfile'])
+                self.out.print(f"\n=== Line list: {nline} lines written to {self.params['lfile']} ===")
+            else:
+                melems.print(self.out)
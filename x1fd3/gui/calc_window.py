@@ -13,7 +13,8 @@ from x1fd3.cli import DriverPecApprox, \
                       DriverLevelsAn, \
                       DriverSpectrumPW, \
                       DriverSpectrumAn, \
-                      DriverFitExp
+                      DriverFitExp, \
+                      DriverPecScan
 
 class CalcWindow:
     '''
@@ -168,9 +169,45 @@ class CalcWindow:
 
             row += 1
 
+        # scan params
+        if mode in [
+            'PecScan'
+        ]:
+
+            tk.Label(
+                self.root,
+                text='Parameters for PEC scan, example: input/params_scan.txt'
+            ).grid(
+                row=row,
+                column=0,
+                sticky='e'
+            )
+
+            self.file_scan_calc = ttk.Entry(
+                self.root,
+                width=50
+            )
+            self.file_scan_calc.grid(
+                row=row,
+                column=1
+            )
+
+            self.open_scan_calc = ttk.Button(
+                self.root,
+                text='Open a file',
+                command=lambda: self.select_file(self.file_scan_calc)
+            )
+            self.open_scan_calc.grid(
+                row=row,
+                column=2
+            )
+
+            row += 1
+
         # init params
         if mode in [
-            'PecApprox'
+            'PecApprox',
+            'PecScan'
         ]:
             tk.Label(
                 self.root,
@@ -243,7 +280,8 @@ class CalcWindow:
             'PecApprox',
             'LevelsPW',
             'SpectrumPW',
-            'FitExp'
+            'FitExp',
+            'PecScan'
         ]:
             tk.Label(
                 self.root,
@@ -527,6 +565,12 @@ class CalcWindow:
                     self.file_pw_pec.get(),
                     self.file_exp.get()
                 ]
+            case 'PecScan':
+                input_files = [
+                    self.file_scan_calc.get(),
+                    self.file_init_params.get(),
+                    self.file_pw_pec.get()
+                ]
 
         # check input files
         if not all(input_files):
@@ -560,6 +604,8 @@ class CalcWindow:
                     DriverSpectrumAn(input_files, out).run()
                 case 'FitExp':
                     DriverFitExp(input_files, out).run()
+                case 'PecScan':
+                    DriverPecScan(input_files, out).run()
             self.print_message('Success!\n', Logger())
         except BaseException as ex: # pylint: disable = W0718
             self.print_message('Error!', Logger())
@@ -55,6 +55,7 @@ class MainWindow:
             'SpectrumPW': 'Vib.-rot. spectrum calculation with point-wise PEC',
             'SpectrumAn': 'Vib.-rot. spectrum calculation with analytic PEC',
             'FitExp': 'Fit PEC to reproduce experimental vib.-rot. levels',
+            'PecScan': 'PEC approximation scan over orders of beta(R) with model selection',
             'Plot': 'Visualize results from out file'
         }
 